@@ -0,0 +1,94 @@
+import os
+import time
+from typing import Optional
+from bson import ObjectId
+from dotenv import load_dotenv
+from http_cache import json_body, make_etag
+
+load_dotenv()
+
+# Safety net for multi-worker deployments: a worker only sees its own
+# invalidations, so snapshots are also dropped after this many seconds
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "60"))
+
+# Fields order pricing needs from an apple document
+PRICING_PROJECTION = {"name": 1, "price": 1}
+
+# In-process snapshot of the apples collection, plus the serialized
+# GET /apples body and its ETag
+_catalog = {
+    "version": 0,
+    "by_id": None,
+    "body": None,
+    "etag": None,
+    "loaded_at": 0.0
+}
+
+def invalidate_catalog():
+    """Drop the catalog snapshot - call after every apple write"""
+    _catalog["version"] += 1
+    _catalog["by_id"] = None
+    _catalog["body"] = None
+    _catalog["etag"] = None
+
+def catalog_version() -> int:
+    """Current catalog version (bumped on every invalidation)"""
+    return _catalog["version"]
+
+def _snapshot_fresh() -> bool:
+    return (
+        _catalog["by_id"] is not None
+        and time.monotonic() - _catalog["loaded_at"] < CATALOG_CACHE_TTL
+    )
+
+def get_cached_catalog() -> Optional[dict]:
+    """Serialized catalog ({"body", "etag"}) if the snapshot is fresh"""
+    if not _snapshot_fresh():
+        return None
+    return {"body": _catalog["body"], "etag": _catalog["etag"]}
+
+def store_catalog(apples: list[dict], version: int) -> dict:
+    """
+    Serialize a freshly loaded catalog and store it as the snapshot.
+
+    Not stored if the catalog was invalidated since 'version' was read,
+    so a slow load can't resurrect pre-write data. Returns the serialized
+    catalog either way.
+    """
+    body = json_body({"apples": apples})
+    serialized = {"body": body, "etag": make_etag(body)}
+
+    if version == _catalog["version"]:
+        _catalog["by_id"] = {str(apple["_id"]): apple for apple in apples}
+        _catalog["body"] = serialized["body"]
+        _catalog["etag"] = serialized["etag"]
+        _catalog["loaded_at"] = time.monotonic()
+
+    return serialized
+
+async def load_catalog(db, version: int) -> dict:
+    """Read the apples collection and store it as the snapshot (see store_catalog)"""
+    apples = await db["apples"].find().sort("name", 1).to_list(length=None)
+    return store_catalog(apples, version)
+
+async def find_apples(db, apple_ids: list[str]) -> dict[str, dict]:
+    """
+    Load apples referenced by an order, keyed by id.
+
+    Served from the snapshot when fresh, otherwise with a single $in query
+    fetching only the pricing fields. Unknown or invalid ids are absent.
+    """
+    if _snapshot_fresh():
+        by_id = _catalog["by_id"]
+        return {apple_id: by_id[apple_id] for apple_id in apple_ids if apple_id in by_id}
+
+    object_ids = [ObjectId(apple_id) for apple_id in set(apple_ids) if ObjectId.is_valid(apple_id)]
+    if not object_ids:
+        return {}
+
+    apples = await db["apples"].find(
+        {"_id": {"$in": object_ids}},
+        PRICING_PROJECTION
+    ).to_list(length=None)
+
+    return {str(apple["_id"]): apple for apple in apples}
@@ -0,0 +1,65 @@
+import time
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a while.
+
+    Closed: calls go through, consecutive failures are counted. After
+    failure_threshold of them the breaker opens and calls are refused until
+    cooldown seconds have passed; then one probe call is let through
+    (half-open). A successful probe closes the breaker, a failed one opens
+    it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_count = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+
+    def allow(self) -> bool:
+        """Whether a call may be made now"""
+        if self.state == "closed":
+            return True
+
+        now = time.monotonic()
+        if self.state == "open" and now - self._opened_at >= self.cooldown:
+            self.state = "half-open"
+            self._probe_started = now
+            return True
+        # A probe that never reported back (e.g. cancelled) doesn't block forever
+        if self.state == "half-open" and now - self._probe_started >= self.cooldown:
+            self._probe_started = now
+            return True
+
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        """A call worked - close the breaker"""
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        """A call failed - open the breaker after too many in a row, or when a probe fails"""
+        self.failures += 1
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened_count += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        """Current state and counters"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "cooldown": self.cooldown,
+            "opened": self.opened_count,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,144 @@
+import os
+import zlib
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+from content_coding import accepted_encodings, brotli_module, is_compressible
+
+load_dotenv()
+
+# Responses smaller than this aren't worth compressing
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Low brotli qualities are fast enough for dynamic responses
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+class GzipStream:
+    def __init__(self, level: int):
+        # wbits=31: gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+class BrotliStream:
+    def __init__(self, brotli, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, whichever the client prefers
+    (brotli first, when the 'brotli' package is installed).
+
+    Skips small bodies, non-textual content types, ranged/empty responses and
+    anything that already carries a Content-Encoding (e.g. precompressed
+    frontend assets). Streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.brotli = brotli_module()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding"))
+        if self.brotli is not None and "br" in accepted:
+            coding = "br"
+        elif "gzip" in accepted:
+            coding = "gzip"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, send, coding)
+        await self.app(scope, receive, responder)
+
+    def new_stream(self, coding: str):
+        if coding == "br":
+            return BrotliStream(self.brotli, self.brotli_quality)
+        return GzipStream(self.gzip_level)
+
+class CompressionResponder:
+    """Per-request send() wrapper deciding whether and how to compress"""
+
+    def __init__(self, middleware: CompressionMiddleware, send, coding: str):
+        self.middleware = middleware
+        self.send = send
+        self.coding = coding
+        self.start_message = None
+        self.stream = None
+        self.passthrough = False
+        self.buffer = b""
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                message["status"] < 200
+                or message["status"] in (204, 206, 304)
+                or "content-encoding" in headers
+                or not is_compressible(content_type)
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is None:
+            self.buffer += body
+            if more_body and len(self.buffer) < self.middleware.minimum_size:
+                return
+            if not more_body and len(self.buffer) < self.middleware.minimum_size:
+                # Small enough to send as is
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": self.buffer, "more_body": False})
+                return
+            body, self.buffer = self.buffer, b""
+            await self._start_compressed()
+
+        if more_body:
+            data = self.stream.compress(body) + self.stream.flush()
+        else:
+            data = self.stream.compress(body) + self.stream.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def _start_compressed(self):
+        self.stream = self.middleware.new_stream(self.coding)
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.coding
+        headers.add_vary_header("Accept-Encoding")
+        if "content-length" in headers:
+            del headers["content-length"]
+        # The encoded bytes differ from what a strong validator promises
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        await self.send(self.start_message)
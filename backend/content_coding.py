@@ -0,0 +1,34 @@
+from typing import Optional
+
+# Only textual payloads are worth compressing - images/archives already are
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-ndjson",
+    "image/svg+xml",
+)
+
+def is_compressible(media_type: str) -> bool:
+    """Whether a Content-Type is one of COMPRESSIBLE_TYPES"""
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+def brotli_module():
+    """The optional 'brotli' package, or None"""
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+def accepted_encodings(accept_encoding: Optional[str]) -> set[str]:
+    """Content codings a client accepts (q=0 means refused)"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
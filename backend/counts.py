@@ -0,0 +1,67 @@
+from typing import Optional
+from fastapi import HTTPException, status
+from pymongo import UpdateOne
+
+# How listing endpoints compute "total"
+TOTAL_MODES = ("exact", "approx", "none")
+
+# Per-status order counters: {_id: <status>, count: <int>}
+ORDER_COUNTS = "order_counts"
+
+def validate_total_mode(total: str) -> str:
+    """Reject unknown total= values with 400"""
+    if total not in TOTAL_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Nieprawidłowy tryb total. Musi być jeden z: {', '.join(TOTAL_MODES)}"
+        )
+    return total
+
+async def record_status_change(db, new_status: Optional[str], old_status: Optional[str] = None):
+    """Keep per-status order counters in step with an insert or status change"""
+    if new_status == old_status:
+        return
+    if old_status:
+        await db[ORDER_COUNTS].update_one({"_id": old_status}, {"$inc": {"count": -1}}, upsert=True)
+    if new_status:
+        await db[ORDER_COUNTS].update_one({"_id": new_status}, {"$inc": {"count": 1}}, upsert=True)
+
+async def record_bulk_status_change(db, new_status: str, previous: dict[str, int]):
+    """Counter update for a bulk status change; previous maps old status -> orders moved"""
+    moved = {old: n for old, n in previous.items() if old != new_status and n > 0}
+    if not moved:
+        return
+    ops = [UpdateOne({"_id": old}, {"$inc": {"count": -n}}, upsert=True) for old, n in moved.items()]
+    ops.append(UpdateOne({"_id": new_status}, {"$inc": {"count": sum(moved.values())}}, upsert=True))
+    await db[ORDER_COUNTS].bulk_write(ops, ordered=False)
+
+def rebuild_order_counts(db):
+    """Recompute per-status counters from 'orders' (sync, run at startup)"""
+    counts = {
+        row["_id"]: row["count"]
+        for row in db["orders"].aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])
+    }
+    db[ORDER_COUNTS].delete_many({"_id": {"$nin": list(counts)}})
+    for order_status, count in counts.items():
+        db[ORDER_COUNTS].update_one({"_id": order_status}, {"$set": {"count": count}}, upsert=True)
+
+async def listing_total(db, collection: str, query: dict, mode: str) -> Optional[int]:
+    """
+    Total for a paginated listing.
+
+    - exact: count_documents over the filter
+    - approx: collection metadata for unfiltered listings, per-status
+      counters for orders filtered by status, exact count otherwise
+    - none: skip counting entirely
+    """
+    if mode == "none":
+        return None
+
+    if mode == "approx":
+        if not query:
+            return await db[collection].estimated_document_count()
+        if collection == "orders" and set(query) == {"status"}:
+            counter = await db[ORDER_COUNTS].find_one({"_id": query["status"]})
+            return max(counter["count"], 0) if counter else 0
+
+    return await db[collection].count_documents(query)
@@ -1,8 +1,14 @@
 import os
+import asyncio
 from pymongo import MongoClient
 from pymongo.errors import ServerSelectionTimeoutError
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from dotenv import load_dotenv
 from datetime import datetime
+from counts import rebuild_order_counts
+from stock import init_stock
+from slots import rebuild_slot_bookings
+from stats import ORDER_STATS, rebuild_order_stats
 
 load_dotenv()
 
@@ -10,17 +16,33 @@ load_dotenv()
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "srebrnasad")
 
+# How long OSRM route distances stay in the 'route_cache' collection
+ROUTE_CACHE_DB_TTL = int(os.getenv("ROUTE_CACHE_DB_TTL", str(30 * 24 * 3600)))
+
+# Connection pool size for the async client used by the routers
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+
 client: MongoClient = None
 db = None
 
+# Async (motor) client used by request handlers so DB I/O never blocks the event loop
+async_client: AsyncIOMotorClient = None
+async_db: AsyncIOMotorDatabase = None
+
 def connect_db():
     """Connect to MongoDB"""
-    global client, db
+    global client, db, async_client, async_db
     try:
         client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=5000)
         # Verify connection
         client.admin.command('ping')
         db = client[DATABASE_NAME]
+        async_client = AsyncIOMotorClient(
+            MONGODB_URL,
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE
+        )
+        async_db = async_client[DATABASE_NAME]
         print(f"✓ Connected to MongoDB: {DATABASE_NAME}")
         return db
     except ServerSelectionTimeoutError as e:
@@ -58,6 +80,7 @@ def init_db():
                 "price": 4.50,
                 "available": True,
                 "max_quantity_kg": 250,
+                "stock_kg": 250,
                 "created_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow()
             },
@@ -67,6 +90,7 @@ def init_db():
                 "price": 5.00,
                 "available": True,
                 "max_quantity_kg": 250,
+                "stock_kg": 250,
                 "created_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow()
             },
@@ -76,6 +100,7 @@ def init_db():
                 "price": 5.50,
                 "available": True,
                 "max_quantity_kg": 250,
+                "stock_kg": 250,
                 "created_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow()
             },
@@ -90,17 +115,81 @@ def init_db():
         db["orders"].create_index("created_at")
         db["orders"].create_index("pickup_date")
         print("✓ Created 'orders' collection")
+    
+    # Compound index backing keyset pagination (created_at, _id), also
+    # for collections that existed before it was introduced
+    db["contact_messages"].create_index([("created_at", -1), ("_id", -1)])
+    
+    # Cover the admin table's view=summary listing (no document fetches),
+    # with and without a status filter. Their (created_at, _id) and
+    # (status, created_at, _id) prefixes also serve keyset pagination.
+    summary_keys = [
+        ("created_at", -1), ("_id", -1), ("status", 1), ("customer_name", 1),
+        ("customer_phone", 1), ("pickup_date", 1), ("pickup_time", 1),
+        ("delivery", 1), ("total_quantity_kg", 1), ("total_price", 1)
+    ]
+    db["orders"].create_index(summary_keys, name="orders_summary")
+    db["orders"].create_index(
+        [("status", 1)] + [key for key in summary_keys if key[0] != "status"],
+        name="orders_summary_by_status"
+    )
+    
+    # Per-status order counters can drift (crashes, manual edits) - resync on startup
+    rebuild_order_counts(db)
+    print("✓ Rebuilt order status counters")
+    
+    # Stock is set by admins and taken by orders; only untracked apples get a starting value
+    if init_stock(db):
+        print("✓ Started stock tracking for apple varieties")
+    
+    # Sales rollups (day, variety, status); `python stats.py rebuild` recomputes them
+    db[ORDER_STATS].create_index([("day", 1), ("status", 1), ("apple_id", 1)])
+    # First deploy: orders keep rollups up to date only from now on, so
+    # start from their full history (also avoids negative rollups when
+    # older orders change status)
+    if db[ORDER_STATS].estimated_document_count() == 0 and db["orders"].estimated_document_count() > 0:
+        rebuild_order_stats(db)
+        print("✓ Built sales rollups from existing orders")
+    
+    # Pickup availability reads a date range of slots in one query
+    db["pickup_slots"].create_index([("date", 1), ("time", 1)])
+    # Includes orders placed before slots were booked
+    rebuild_slot_bookings(db)
+    print("✓ Rebuilt pickup slot bookings")
+    
+    if "route_cache" not in db.list_collection_names():
+        db.create_collection("route_cache")
+        # Mongo drops expired route distances on its own
+        db["route_cache"].create_index("created_at", expireAfterSeconds=ROUTE_CACHE_DB_TTL)
+        print("✓ Created 'route_cache' collection")
 
 def get_db():
-    """Get database connection"""
+    """
+    Get synchronous database connection.
+    
+    Only for startup/maintenance code - request handlers use get_async_db().
+    """
     global db
     if db is None:
         db = connect_db()
     return db
 
+async def get_async_db():
+    """
+    Get async (motor) database connection for request handlers.
+    
+    Reconnect attempts run in a worker thread so an unreachable server
+    doesn't stall the event loop for the ping timeout.
+    """
+    if async_db is None:
+        await asyncio.to_thread(connect_db)
+    return async_db
+
 def close_db():
     """Close database connection"""
-    global client
+    global client, async_client
+    if async_client:
+        async_client.close()
     if client:
         client.close()
         print("✓ Closed MongoDB connection")
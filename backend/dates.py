@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, status
+
+def parse_date(value: Optional[str], field: str) -> Optional[datetime]:
+    """Parse a YYYY-MM-DD query parameter (400 if malformed, None if empty)"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Nieprawidłowa data w {field} (oczekiwano RRRR-MM-DD)"
+        )
+
+def mongo_now() -> datetime:
+    """utcnow() truncated to milliseconds, as Mongo stores it - so it can be matched exactly"""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
@@ -0,0 +1,165 @@
+import os
+import math
+import mmap
+import struct
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Precomputed road distances from the orchard (built with `python distance_grid.py build`)
+DISTANCE_GRID_PATH = os.getenv("DISTANCE_GRID_PATH", "data/distance_grid.bin")
+
+# File layout: header, then rows * cols little-endian uint16 distances in
+# units of 10 m (row-major, south to north / west to east)
+GRID_MAGIC = b"SSDG"
+GRID_VERSION = 1
+GRID_HEADER = struct.Struct("<4sHII6d")
+GRID_UNIT_M = 10
+GRID_NO_ROUTE = 0xFFFF
+
+# Points per OSRM table request while building (osrm-routed --max-table-size)
+GRID_BUILD_BATCH = 100
+
+KM_PER_DEGREE_LAT = 111.32
+
+class DistanceGrid:
+    """
+    Memory-mapped grid of road distances from one origin.
+
+    Lookups interpolate bilinearly between the four surrounding grid points
+    and return None outside the grid or next to points without a route.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, cols, lat0, lon0, dlat, dlon, origin_lat, origin_lon = GRID_HEADER.unpack_from(self._mm, 0)
+        if magic != GRID_MAGIC or version != GRID_VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} is not a distance grid (version {GRID_VERSION})")
+        if len(self._mm) < GRID_HEADER.size + rows * cols * 2:
+            self._mm.close()
+            raise ValueError(f"{path} is truncated")
+        self.rows, self.cols = rows, cols
+        self.lat0, self.lon0, self.dlat, self.dlon = lat0, lon0, dlat, dlon
+        self.origin_lat, self.origin_lon = origin_lat, origin_lon
+        self.path = path
+
+    def _value(self, row: int, col: int) -> int:
+        return struct.unpack_from("<H", self._mm, GRID_HEADER.size + (row * self.cols + col) * 2)[0]
+
+    def covers_origin(self, lat: float, lon: float) -> bool:
+        """Whether distances in this grid are measured from (lat, lon)"""
+        return abs(lat - self.origin_lat) < 1e-6 and abs(lon - self.origin_lon) < 1e-6
+
+    def lookup(self, lat: float, lon: float) -> Optional[float]:
+        """Road distance in kilometers from the origin to (lat, lon), or None"""
+        r = (lat - self.lat0) / self.dlat
+        c = (lon - self.lon0) / self.dlon
+        if not (0 <= r <= self.rows - 1 and 0 <= c <= self.cols - 1):
+            return None
+        r0 = min(int(r), self.rows - 2)
+        c0 = min(int(c), self.cols - 2)
+        fr, fc = r - r0, c - c0
+        v00, v01 = self._value(r0, c0), self._value(r0, c0 + 1)
+        v10, v11 = self._value(r0 + 1, c0), self._value(r0 + 1, c0 + 1)
+        if GRID_NO_ROUTE in (v00, v01, v10, v11):
+            return None
+        value = (
+            v00 * (1 - fr) * (1 - fc) + v01 * (1 - fr) * fc
+            + v10 * fr * (1 - fc) + v11 * fr * fc
+        )
+        return round(value * GRID_UNIT_M / 1000, 1)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "rows": self.rows,
+            "cols": self.cols,
+            "step_km": round(self.dlat * KM_PER_DEGREE_LAT, 3),
+            "bytes": len(self._mm)
+        }
+
+    def close(self):
+        self._mm.close()
+
+_grid: Optional[DistanceGrid] = None
+_grid_checked = False
+
+def get_distance_grid() -> Optional[DistanceGrid]:
+    """The distance grid, opened on first use; None when it hasn't been built"""
+    global _grid, _grid_checked
+    if not _grid_checked:
+        _grid_checked = True
+        if os.path.exists(DISTANCE_GRID_PATH):
+            try:
+                _grid = DistanceGrid(DISTANCE_GRID_PATH)
+                print(f"✓ Distance grid loaded ({_grid.rows}x{_grid.cols})")
+            except (OSError, ValueError, struct.error) as e:
+                print(f"⚠️  Distance grid unusable: {e}")
+    return _grid
+
+def close_distance_grid():
+    """Unmap the distance grid"""
+    global _grid, _grid_checked
+    if _grid is not None:
+        _grid.close()
+    _grid, _grid_checked = None, False
+
+def build_distance_grid(path: str, origin_lat: float, origin_lon: float, radius_km: float, step_km: float, osrm_url: str):
+    """
+    Compute road distances from the origin to a square grid of points
+    covering radius_km with OSRM table requests, and write the grid file.
+
+    Meant for a local OSRM instance (osrm-routed); the public demo server
+    rate-limits and caps table sizes.
+    """
+    import httpx
+
+    dlat = step_km / KM_PER_DEGREE_LAT
+    dlon = step_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(origin_lat)))
+    half = math.ceil(radius_km / step_km)
+    rows = cols = 2 * half + 1
+    lat0 = origin_lat - half * dlat
+    lon0 = origin_lon - half * dlon
+
+    points = [(lat0 + r * dlat, lon0 + c * dlon) for r in range(rows) for c in range(cols)]
+    values = []
+
+    with httpx.Client(base_url=osrm_url.rstrip("/"), timeout=60.0) as client:
+        for start in range(0, len(points), GRID_BUILD_BATCH):
+            batch = points[start:start + GRID_BUILD_BATCH]
+            coordinates = ";".join(f"{lon},{lat}" for lat, lon in [(origin_lat, origin_lon)] + batch)
+            response = client.get(f"/table/v1/driving/{coordinates}", params={"sources": 0, "annotations": "distance"})
+            response.raise_for_status()
+            distances = response.json()["distances"][0][1:]
+            for meters in distances:
+                if meters is None:
+                    values.append(GRID_NO_ROUTE)
+                else:
+                    values.append(min(round(meters / GRID_UNIT_M), GRID_NO_ROUTE - 1))
+            print(f"  {min(start + GRID_BUILD_BATCH, len(points))}/{len(points)} points")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".part"
+    with open(temp_path, "wb") as f:
+        f.write(GRID_HEADER.pack(GRID_MAGIC, GRID_VERSION, rows, cols, lat0, lon0, dlat, dlon, origin_lat, origin_lon))
+        f.write(struct.pack(f"<{len(values)}H", *values))
+    os.replace(temp_path, path)
+
+if __name__ == "__main__":
+    import argparse
+    from routing import ORCHARD_LAT, ORCHARD_LON, OSRM_URL
+
+    parser = argparse.ArgumentParser(description="Precompute road distances from the orchard")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--radius-km", type=float, default=55.0, help="area covered around the orchard (default: 55)")
+    parser.add_argument("--step-km", type=float, default=0.5, help="grid spacing (default: 0.5)")
+    parser.add_argument("--osrm-url", default=OSRM_URL, help="OSRM server (default: OSRM_URL)")
+    parser.add_argument("--output", default=DISTANCE_GRID_PATH, help="grid file (default: DISTANCE_GRID_PATH)")
+    args = parser.parse_args()
+
+    build_distance_grid(args.output, ORCHARD_LAT, ORCHARD_LON, args.radius_km, args.step_km, args.osrm_url)
+    grid = DistanceGrid(args.output)
+    print(f"✓ Wrote {args.output} ({grid.rows}x{grid.cols}, {grid.stats()['bytes']} bytes)")
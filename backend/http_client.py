@@ -0,0 +1,51 @@
+import os
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Outgoing HTTP connection pool settings
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+
+http_client: httpx.AsyncClient = None
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional 'h2' package (httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the app-wide HTTP client with keep-alive connection pooling"""
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            http2=http2_available(),
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+        print(f"✓ HTTP client ready (http2={'on' if http2_available() else 'off'})")
+    return http_client
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it if the app hasn't yet"""
+    if http_client is None:
+        return create_http_client()
+    return http_client
+
+async def close_http_client():
+    """Close the shared HTTP client and its pooled connections"""
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+        print("✓ Closed HTTP client")
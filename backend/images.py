@@ -0,0 +1,186 @@
+import os
+import json
+import asyncio
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Responsive variants generated for every uploaded image
+IMAGE_WIDTHS = sorted(int(w) for w in os.getenv("IMAGE_WIDTHS", "480,960,1600").split(",") if w.strip())
+IMAGE_FORMATS = [f.strip().lower() for f in os.getenv("IMAGE_FORMATS", "webp,avif").split(",") if f.strip()]
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+# Pillow format names for the variant extensions
+PIL_FORMATS = {"webp": "WEBP", "avif": "AVIF"}
+
+image_pool: ProcessPoolExecutor = None
+
+def supported_formats() -> list[str]:
+    """Configured variant formats Pillow can actually encode here"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+    try:
+        import pillow_avif  # noqa: F401 - registers the AVIF codec
+    except ImportError:
+        pass
+    # Loads every format plugin so Image.SAVE is complete
+    Image.init()
+    return [fmt for fmt in IMAGE_FORMATS if PIL_FORMATS.get(fmt) in Image.SAVE]
+
+def start_image_pool() -> ProcessPoolExecutor:
+    """Start the worker processes that encode image variants"""
+    global image_pool
+    if image_pool is None:
+        # spawn: workers only import this module, never the app's threads/sockets
+        image_pool = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        print(f"✓ Image pool ready ({IMAGE_WORKERS} workers, formats: {', '.join(supported_formats()) or 'none'})")
+    return image_pool
+
+def shutdown_image_pool():
+    """Stop the image worker processes"""
+    global image_pool
+    if image_pool is not None:
+        image_pool.shutdown(wait=False, cancel_futures=True)
+        image_pool = None
+
+def variant_name(stem: str, width: int, fmt: str) -> str:
+    """File name of one variant, e.g. '<stem>-960w.webp'"""
+    return f"{stem}-{width}w.{fmt}"
+
+def manifest_name(stem: str) -> str:
+    """File name of the variant list kept next to an upload"""
+    return f"{stem}.variants.json"
+
+def build_manifest(variants: list[dict], url_prefix: str) -> dict:
+    """Response manifest: variants with URLs plus one srcset string per format"""
+    variants = [{**v, "url": f"{url_prefix}/{v['filename']}"} for v in variants]
+    formats = list(dict.fromkeys(v["format"] for v in variants))
+    srcset = {
+        fmt: ", ".join(f"{v['url']} {v['width']}w" for v in variants if v["format"] == fmt)
+        for fmt in formats
+    }
+    return {"variants": variants, "srcset": srcset}
+
+def load_variants(output_dir: str, stem: str, url_prefix: str):
+    """Manifest of variants generated earlier for this stem, or None"""
+    try:
+        with open(os.path.join(output_dir, manifest_name(stem))) as f:
+            return build_manifest(json.load(f), url_prefix)
+    except (OSError, ValueError):
+        return None
+
+def _temp_file(output_dir: str, filename: str) -> str:
+    """Unique temp path next to filename, renamed into place once written"""
+    fd, temp_path = tempfile.mkstemp(dir=output_dir, prefix=f".{filename}.", suffix=".part")
+    os.close(fd)
+    return temp_path
+
+def build_variants(source_path: str, output_dir: str, stem: str, widths: list[int], formats: list[str], quality: int) -> list[dict]:
+    """
+    Resize an image to each width in each format (runs in a worker process).
+
+    Orientation from EXIF is applied, then EXIF/XMP metadata is dropped
+    (the ICC profile is kept for colour fidelity). Images are never
+    upscaled; animated images are skipped.
+
+    Concurrent builds of the same upload (identical files uploaded at
+    once) each write to their own temp files; an existing manifest means
+    the variants are already there.
+    """
+    manifest_path = os.path.join(output_dir, manifest_name(stem))
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    from PIL import Image, ImageOps
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+
+    with Image.open(source_path) as image:
+        if getattr(image, "is_animated", False):
+            return []
+
+        image = ImageOps.exif_transpose(image)
+        # Some encoders fall back to image.info, so drop EXIF/XMP there too
+        for key in ("exif", "xmp", "XML:com.adobe.xmp"):
+            image.info.pop(key, None)
+        # A CMYK profile doesn't describe the converted RGB pixels
+        icc_profile = image.info.get("icc_profile") if image.mode != "CMYK" else None
+        image.info.pop("icc_profile", None)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+        # Every configured width below the original, plus the original width capped at the largest
+        targets = {w for w in widths if w < image.width}
+        targets.add(min(image.width, widths[-1]))
+        variants = []
+
+        for width in sorted(targets):
+            height = round(image.height * width / image.width)
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+
+            for fmt in formats:
+                filename = variant_name(stem, width, fmt)
+                path = os.path.join(output_dir, filename)
+                temp_path = _temp_file(output_dir, filename)
+                try:
+                    # No exif= passed and info is scrubbed, so no EXIF/GPS ends up in the variant;
+                    # the ICC profile is passed explicitly since the WebP encoder ignores info
+                    resized.save(temp_path, format=PIL_FORMATS[fmt], quality=quality, icc_profile=icc_profile)
+                    os.replace(temp_path, path)
+                except Exception:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+                variants.append({
+                    "filename": filename,
+                    "width": width,
+                    "height": height,
+                    "format": fmt,
+                    "size": os.path.getsize(path)
+                })
+
+    # Lets a re-upload of identical content reuse these variants
+    temp_path = _temp_file(output_dir, manifest_name(stem))
+    with open(temp_path, "w") as f:
+        json.dump(variants, f)
+    os.replace(temp_path, manifest_path)
+
+    return variants
+
+async def create_variants(source_path: str, output_dir: str, stem: str, url_prefix: str) -> dict:
+    """
+    Generate responsive variants in the process pool.
+
+    Returns a manifest with one srcset string per format. Empty when Pillow
+    isn't installed or the file can't be decoded - the original still works.
+    """
+    formats = supported_formats()
+    if not formats or not IMAGE_WIDTHS:
+        return {"variants": [], "srcset": {}}
+
+    loop = asyncio.get_running_loop()
+    try:
+        variants = await loop.run_in_executor(
+            start_image_pool(),
+            build_variants,
+            source_path, output_dir, stem, IMAGE_WIDTHS, formats, IMAGE_QUALITY
+        )
+    except Exception as e:
+        print(f"⚠️  Image variants failed for {source_path}: {e}")
+        return {"variants": [], "srcset": {}}
+
+    return build_manifest(variants, url_prefix)
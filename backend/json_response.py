@@ -0,0 +1,27 @@
+from typing import Any
+import orjson
+from bson import ObjectId, Decimal128
+from fastapi.responses import JSONResponse
+
+def bson_default(obj: Any) -> Any:
+    """orjson fallback for BSON types Mongo documents carry"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes; ObjectId/datetime are handled natively"""
+    return orjson.dumps(content, default=bson_default, option=orjson.OPT_NON_STR_KEYS)
+
+class BSONJSONResponse(JSONResponse):
+    """
+    App-wide JSON response rendered with orjson.
+    
+    Return it directly with raw Mongo documents to skip both the per-document
+    _id fix-ups and FastAPI's jsonable_encoder pass.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
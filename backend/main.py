@@ -1,6 +1,5 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from typing import Optional
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
@@ -10,14 +9,21 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from database import get_db, init_db
+from database import get_db, init_db, close_db
+from http_client import create_http_client, close_http_client
+from images import start_image_pool, shutdown_image_pool
+from distance_grid import get_distance_grid, close_distance_grid
+from static_files import UploadsStaticFiles, SpaAssets
+from json_response import BSONJSONResponse
+from compression import CompressionMiddleware
 from routers import contact, upload, content
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Srebrna 15 API",
     description="API for Srebrna 15 orchard website",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=BSONJSONResponse
 )
 
 # CORS middleware - MUST be first!
@@ -30,25 +36,45 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Brotli/gzip for JSON and other text responses (images/precompressed assets pass through)
+app.add_middleware(CompressionMiddleware)
+
 # Include routers with /api prefix
 app.include_router(contact.router, prefix="/api")
 app.include_router(upload.router, prefix="/api")
 app.include_router(content.router, prefix="/api")
 
 # Import and include routers for Phase 2
-from routers import apples, orders
+from routers import apples, orders, pickup_slots
 app.include_router(apples.router, prefix="/api")
 app.include_router(orders.router, prefix="/api")
+app.include_router(pickup_slots.router, prefix="/api")
+
+# Built frontend, indexed once at startup
+FRONTEND_DIST = Path(__file__).parent.parent / "frontend" / "dist"
+spa_assets = SpaAssets(FRONTEND_DIST)
 
 # Mount static files for uploads
 if os.path.exists("uploads"):
-    app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+    app.mount("/uploads", UploadsStaticFiles(directory="uploads"), name="uploads")
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
     init_db()
     print("Database initialized")
+    create_http_client()
+    start_image_pool()
+    spa_assets.build()
+    get_distance_grid()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close database and HTTP connections on shutdown"""
+    await close_http_client()
+    shutdown_image_pool()
+    close_distance_grid()
+    close_db()
 
 @app.get("/health")
 async def health():
@@ -56,16 +82,15 @@ async def health():
     return {"status": "ok"}
 
 # Root endpoint - serve index.html (MUST be before catch-all)
-from fastapi.responses import FileResponse
+from fastapi import Request
 
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Root endpoint - serve frontend"""
-    frontend_dist = Path(__file__).parent.parent / "frontend" / "dist"
-    index_path = frontend_dist / "index.html"
+    response = spa_assets.response(request, "index.html")
     
-    if index_path.exists():
-        return FileResponse(index_path)
+    if response is not None:
+        return response
     
     return {
         "message": "Welcome to Srebrna 15 API",
@@ -75,26 +100,19 @@ async def root():
 
 # Catch-all for SPA routing (must be last, but exclude /api routes)
 @app.get("/{path_name:path}")
-async def serve_spa(path_name: str):
+async def serve_spa(request: Request, path_name: str):
     """Serve SPA index.html for all non-API routes"""
     # Skip /api routes - let them be handled by routers above
     if path_name.startswith("api") or path_name.startswith("uploads"):
         raise HTTPException(status_code=404, detail="Not found")
     
-    frontend_dist = Path(__file__).parent.parent / "frontend" / "dist"
-    
-    if not frontend_dist.exists():
+    if not spa_assets.built:
         raise HTTPException(status_code=404, detail="Frontend not built")
     
-    # Check if it's a static asset file
-    file_path = frontend_dist / path_name
-    if file_path.exists() and file_path.is_file():
-        return FileResponse(file_path)
-    
-    # For any other route, serve index.html (SPA routing)
-    index_path = frontend_dist / "index.html"
-    if index_path.exists():
-        return FileResponse(index_path)
+    # Static asset from the index, or index.html for SPA routes
+    response = spa_assets.response(request, path_name)
+    if response is not None:
+        return response
     
     raise HTTPException(status_code=404, detail="File not found")
     
@@ -0,0 +1,69 @@
+import json
+import base64
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, status
+
+# Newest first; _id breaks ties between documents created in the same instant
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+# Pipeline stages exposing _id as "id" (serialized by the response class)
+RENAME_ID_STAGES = [{"$addFields": {"id": "$_id"}}, {"$project": {"_id": 0}}]
+
+def encode_cursor(doc: dict) -> str:
+    """Opaque 'after' token pointing just past this document"""
+    doc_id = doc["_id"] if "_id" in doc else doc["id"]
+    payload = json.dumps({"t": doc["created_at"].isoformat(), "id": str(doc_id)})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str) -> tuple[datetime, ObjectId]:
+    """Parse an 'after' token back into (created_at, _id)"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nieprawidłowy kursor stronicowania"
+        )
+
+def keyset_filter(after: str) -> dict:
+    """Query fragment selecting documents that sort after the cursor (KEYSET_SORT order)"""
+    created_at, last_id = decode_cursor(after)
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}}
+        ]
+    }
+
+def next_cursor(page: list[dict], limit: int) -> Optional[str]:
+    """Token for the following page, or None when this page is the last one"""
+    if limit <= 0 or len(page) < limit:
+        return None
+    return encode_cursor(page[-1])
+
+def keyset_pipeline(query: dict, after: Optional[str], skip: int, limit: int, fields: Optional[list[str]] = None) -> list[dict]:
+    """
+    Aggregation pipeline for one listing page in KEYSET_SORT order.
+    
+    Uses the 'after' cursor when given, skip otherwise. Documents come out
+    with "id" instead of "_id", ready to be returned without fix-ups. With
+    'fields' only those (plus created_at, needed for the cursor) are fetched.
+    """
+    match = {**query, **keyset_filter(after)} if after else query
+    pipeline = [{"$match": match}, {"$sort": dict(KEYSET_SORT)}]
+    if not after and skip:
+        pipeline.append({"$skip": skip})
+    if limit > 0:
+        pipeline.append({"$limit": limit})
+    if fields is None:
+        return pipeline + RENAME_ID_STAGES
+    # Plain inclusion first, so an index holding every field can cover the
+    # query; _id is renamed afterwards
+    projection = {field: 1 for field in fields}
+    projection.update({"created_at": 1, "_id": 1})
+    return pipeline + [{"$project": projection}] + RENAME_ID_STAGES
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, HTTPException, status, File, UploadFile, Request, Response
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 from bson import ObjectId
-from database import get_db
+from database import get_async_db
+from catalog import invalidate_catalog, catalog_version, get_cached_catalog, load_catalog
+from single_flight import single_flight, flight_key
+from http_cache import etag_matches, not_modified_response
 
 router = APIRouter(prefix="/apples", tags=["apples"])
 
@@ -15,6 +18,8 @@ class AppleCreate(BaseModel):
     available: bool = True
     photo_url: Optional[str] = None
     max_quantity_kg: int = Field(default=250, ge=0)
+    # kg left to sell; starts at max_quantity_kg when not given
+    stock_kg: Optional[int] = Field(default=None, ge=0)
 
 class AppleUpdate(BaseModel):
     """Update apple variety"""
@@ -24,6 +29,8 @@ class AppleUpdate(BaseModel):
     available: Optional[bool] = None
     photo_url: Optional[str] = None
     max_quantity_kg: Optional[int] = None
+    # Restock: sets the kg left to sell
+    stock_kg: Optional[int] = Field(default=None, ge=0)
 
 class AppleResponse(BaseModel):
     """Apple variety response"""
@@ -34,12 +41,20 @@ class AppleResponse(BaseModel):
     available: bool
     photo_url: Optional[str] = None
     max_quantity_kg: int
+    stock_kg: Optional[int] = None
     created_at: datetime
 
 @router.get("/", response_model=dict)
-async def get_all_apples():
-    """Get all available apple varieties"""
-    db = get_db()
+async def get_all_apples(request: Request):
+    """
+    Get all available apple varieties.
+    
+    Served from an in-memory serialized catalog rebuilt only after apple
+    writes; concurrent rebuilds of the same version share one query.
+    'stock_kg' is as of the snapshot (orders don't invalidate it).
+    Supports If-None-Match revalidation (304).
+    """
+    db = await get_async_db()
     
     if db is None:
         return {
@@ -51,12 +66,21 @@ async def get_all_apples():
         }
     
     try:
-        apples = list(db["apples"].find().sort("name", 1))
+        catalog = get_cached_catalog()
+        
+        if catalog is None:
+            version = catalog_version()
+            catalog = await single_flight.do(
+                flight_key("GET /apples", version=version),
+                lambda: load_catalog(db, version)
+            )
+        
+        headers = {"ETag": catalog["etag"], "Cache-Control": "no-cache"}
         
-        for apple in apples:
-            apple["_id"] = str(apple["_id"])
+        if etag_matches(request.headers.get("if-none-match"), catalog["etag"]):
+            return not_modified_response(headers)
         
-        return {"apples": apples}
+        return Response(content=catalog["body"], media_type="application/json", headers=headers)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -66,7 +90,7 @@ async def get_all_apples():
 @router.get("/{apple_id}")
 async def get_apple(apple_id: str):
     """Get specific apple variety by ID"""
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         raise HTTPException(
@@ -75,7 +99,7 @@ async def get_apple(apple_id: str):
         )
     
     try:
-        apple = db["apples"].find_one({"_id": ObjectId(apple_id)})
+        apple = await db["apples"].find_one({"_id": ObjectId(apple_id)})
         
         if not apple:
             raise HTTPException(
@@ -98,7 +122,7 @@ async def create_apple(apple: AppleCreate):
     
     This endpoint should be protected by authentication in production.
     """
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         raise HTTPException(
@@ -114,11 +138,13 @@ async def create_apple(apple: AppleCreate):
             "available": apple.available,
             "photo_url": apple.photo_url,
             "max_quantity_kg": apple.max_quantity_kg,
+            "stock_kg": apple.stock_kg if apple.stock_kg is not None else apple.max_quantity_kg,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
         
-        result = db["apples"].insert_one(apple_doc)
+        result = await db["apples"].insert_one(apple_doc)
+        invalidate_catalog()
         apple_doc["_id"] = str(result.inserted_id)
         
         return {"id": str(result.inserted_id), **apple_doc}
@@ -135,7 +161,7 @@ async def update_apple(apple_id: str, apple: AppleUpdate):
     
     This endpoint should be protected by authentication in production.
     """
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         raise HTTPException(
@@ -147,10 +173,11 @@ async def update_apple(apple_id: str, apple: AppleUpdate):
         update_data = apple.dict(exclude_unset=True)
         update_data["updated_at"] = datetime.utcnow()
         
-        result = db["apples"].update_one(
+        result = await db["apples"].update_one(
             {"_id": ObjectId(apple_id)},
             {"$set": update_data}
         )
+        invalidate_catalog()
         
         if result.matched_count == 0:
             raise HTTPException(
@@ -158,7 +185,7 @@ async def update_apple(apple_id: str, apple: AppleUpdate):
                 detail="Apple not found"
             )
         
-        updated_apple = db["apples"].find_one({"_id": ObjectId(apple_id)})
+        updated_apple = await db["apples"].find_one({"_id": ObjectId(apple_id)})
         updated_apple["_id"] = str(updated_apple["_id"])
         
         return updated_apple
@@ -176,7 +203,7 @@ async def delete_apple(apple_id: str):
     
     This endpoint should be protected by authentication in production.
     """
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         raise HTTPException(
@@ -185,7 +212,8 @@ async def delete_apple(apple_id: str):
         )
     
     try:
-        result = db["apples"].delete_one({"_id": ObjectId(apple_id)})
+        result = await db["apples"].delete_one({"_id": ObjectId(apple_id)})
+        invalidate_catalog()
         
         if result.deleted_count == 0:
             raise HTTPException(
@@ -3,7 +3,10 @@ from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
 from datetime import datetime
 from bson import ObjectId
-from database import get_db
+from database import get_async_db
+from pagination import keyset_pipeline, next_cursor
+from json_response import BSONJSONResponse
+from counts import listing_total, validate_total_mode
 
 router = APIRouter(prefix="/contact", tags=["contact"])
 
@@ -31,7 +34,7 @@ async def create_contact_message(contact: ContactMessage):
     
     The message will be stored in the database for review.
     """
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         # Development mode - just return success
@@ -57,7 +60,7 @@ async def create_contact_message(contact: ContactMessage):
         }
         
         # Insert into database
-        result = db["contact_messages"].insert_one(message_doc)
+        result = await db["contact_messages"].insert_one(message_doc)
         
         return ContactMessageResponse(
             id=str(result.inserted_id),
@@ -75,39 +78,36 @@ async def create_contact_message(contact: ContactMessage):
         )
 
 @router.get("/messages", tags=["admin"])
-async def get_all_messages(skip: int = 0, limit: int = 100):
+async def get_all_messages(skip: int = 0, limit: int = 100, after: Optional[str] = None, total: str = "approx"):
     """
     Get all contact messages (admin only).
     
+    Pass the returned `next_after` token as `after` to fetch the next page
+    at constant cost; `skip` is still honoured when no cursor is given.
+    `total` is exact, approx (collection metadata) or none.
+    
     This endpoint should be protected by authentication in production.
     """
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         return {"messages": [], "total": 0}
     
+    validate_total_mode(total)
+    pipeline = keyset_pipeline({}, after, skip, limit)
+    
     try:
-        messages = list(
-            db["contact_messages"]
-            .find()
-            .sort("created_at", -1)
-            .skip(skip)
-            .limit(limit)
-        )
+        messages = await db["contact_messages"].aggregate(pipeline).to_list(length=None)
+        total_count = await listing_total(db, "contact_messages", {}, total)
         
-        # Convert ObjectId to string
-        for msg in messages:
-            msg["id"] = str(msg["_id"])
-            del msg["_id"]
-        
-        total = db["contact_messages"].count_documents({})
-        
-        return {
+        # Raw documents - the response class encodes ObjectId/datetime
+        return BSONJSONResponse({
             "messages": messages,
-            "total": total,
+            "total": total_count,
             "skip": skip,
-            "limit": limit
-        }
+            "limit": limit,
+            "next_after": next_cursor(messages, limit)
+        })
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -117,7 +117,7 @@ async def get_all_messages(skip: int = 0, limit: int = 100):
 @router.get("/messages/{message_id}", tags=["admin"])
 async def get_message(message_id: str):
     """Get a specific contact message by ID"""
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         raise HTTPException(
@@ -127,7 +127,7 @@ async def get_message(message_id: str):
     
     try:
         from bson import ObjectId
-        message = db["contact_messages"].find_one({"_id": ObjectId(message_id)})
+        message = await db["contact_messages"].find_one({"_id": ObjectId(message_id)})
         
         if not message:
             raise HTTPException(
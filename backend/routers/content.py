@@ -1,11 +1,105 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, status, Request, Response
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
-from database import get_db
+import os
+from database import get_async_db
+from cache import TTLCache
+from http_cache import json_body, make_etag, format_http_date, is_not_modified, not_modified_response
+from single_flight import single_flight, flight_key
 
 router = APIRouter(prefix="/content", tags=["content"])
 
+# Serialized sections, dropped by the matching save endpoint. The TTL bounds
+# staleness across workers, which don't see each other's invalidations.
+CONTENT_CACHE_TTL = float(os.getenv("CONTENT_CACHE_TTL", "300"))
+content_cache = TTLCache(max_entries=16, ttl=CONTENT_CACHE_TTL)
+_section_versions: dict[str, int] = {}
+
+DEFAULT_HERO = {
+    "title": "Witaj w Srebrnej Sadzie",
+    "subtitle": "Świeże jabłka z naszego rodzinnego sadu",
+    "description": "Uprawiamy wysokiej jakości jabłka metodami tradycyjnymi.",
+    "background_image": None
+}
+
+DEFAULT_ABOUT = {
+    "cards": [
+        {
+            "icon": "🌳",
+            "title": "Nasz Sad",
+            "description": "Znajdujący się w Srebrnej, Naruszewo, nasz sad od pokoleń uprawia świeże, pyszne jabłka."
+        },
+        {
+            "icon": "🍎",
+            "title": "Jabłka Najwyższej Jakości",
+            "description": "Uprawiamy wiele odmian jabłek, każdą wybraną ze względu na jej unikalny smak i wartość odżywczą."
+        },
+        {
+            "icon": "👨‍🌾",
+            "title": "Tradycja Rodzinna",
+            "description": "Nasza rodzina uprawia ziemię w Naruszewie od dziesięcioleci."
+        }
+    ]
+}
+
+DEFAULT_GALLERY = {
+    "images": [
+        {"id": "1", "title": "Widok Sadu", "description": "Piękny widok na nasz sad", "category": "orchard", "photo_url": None},
+        {"id": "2", "title": "Świeże Jabłka", "description": "Świeżo zebrane jabłka", "category": "apples", "photo_url": None},
+        {"id": "3", "title": "Czas Zbioru", "description": "Zbieranie jabłek", "category": "harvest", "photo_url": None},
+    ]
+}
+
+def invalidate_section(section: str):
+    """Drop a cached section - call after saving it"""
+    _section_versions[section] = _section_versions.get(section, 0) + 1
+    content_cache.invalidate(section)
+
+async def load_section(db, section: str, default: dict) -> dict:
+    """
+    Serialized section content ({"body", "etag", "updated_at"}).
+    
+    Read from Mongo only on a cache miss; concurrent misses for the same
+    section version share one read.
+    """
+    cached = content_cache.get(section)
+    if cached is not None:
+        return cached
+    
+    version = _section_versions.get(section, 0)
+    return await single_flight.do(
+        flight_key(f"GET /content/{section}", version=version),
+        lambda: read_section(db, section, default, version)
+    )
+
+async def read_section(db, section: str, default: dict, version: int) -> dict:
+    """Read and serialize one section, caching it unless a save happened since 'version'"""
+    content = await db["site_content"].find_one({"section": section}, {"_id": 0, "section": 0})
+    
+    if not content:
+        content = default
+    
+    body = json_body(content)
+    entry = {"body": body, "etag": make_etag(body), "updated_at": content.get("updated_at")}
+    
+    # Don't cache a load that raced with a save
+    if version == _section_versions.get(section, 0):
+        content_cache.set(section, entry)
+    
+    return entry
+
+def section_response(request: Request, entry: dict) -> Response:
+    """Cached section as a response, or 304 if the client copy is current"""
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if entry["updated_at"]:
+        headers["Last-Modified"] = format_http_date(entry["updated_at"])
+    
+    if is_not_modified(request, entry["etag"], entry["updated_at"]):
+        return not_modified_response(headers)
+    
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
 class HeroContent(BaseModel):
     """Hero section content"""
     title: str
@@ -20,13 +114,13 @@ class AboutContent(BaseModel):
 @router.post("/hero")
 async def save_hero_content(content: HeroContent):
     """Save hero section content"""
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         return {"message": "✓ Content saved (dev mode)"}
     
     try:
-        db["site_content"].update_one(
+        await db["site_content"].update_one(
             {"section": "hero"},
             {
                 "$set": {
@@ -40,6 +134,7 @@ async def save_hero_content(content: HeroContent):
             },
             upsert=True
         )
+        invalidate_section("hero")
         
         return {"message": "✓ Zawartość Hero zapisana"}
     except Exception as e:
@@ -49,32 +144,15 @@ async def save_hero_content(content: HeroContent):
         )
 
 @router.get("/hero")
-async def get_hero_content():
-    """Get hero section content"""
-    db = get_db()
+async def get_hero_content(request: Request):
+    """Get hero section content (cached, supports conditional GET)"""
+    db = await get_async_db()
     
     if db is None:
-        return {
-            "title": "Witaj w Srebrnej Sadzie",
-            "subtitle": "Świeże jabłka z naszego rodzinnego sadu",
-            "description": "Uprawiamy wysokiej jakości jabłka metodami tradycyjnymi.",
-            "background_image": None
-        }
+        return DEFAULT_HERO
     
     try:
-        content = db["site_content"].find_one({"section": "hero"})
-        
-        if not content:
-            return {
-                "title": "Witaj w Srebrnej Sadzie",
-                "subtitle": "Świeże jabłka z naszego rodzinnego sadu",
-                "description": "Uprawiamy wysokiej jakości jabłka metodami tradycyjnymi.",
-                "background_image": None
-            }
-        
-        del content["_id"]
-        del content["section"]
-        return content
+        return section_response(request, await load_section(db, "hero", DEFAULT_HERO))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -84,13 +162,13 @@ async def get_hero_content():
 @router.post("/about")
 async def save_about_content(content: AboutContent):
     """Save about section content"""
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         return {"message": "✓ Content saved (dev mode)"}
     
     try:
-        db["site_content"].update_one(
+        await db["site_content"].update_one(
             {"section": "about"},
             {
                 "$set": {
@@ -101,6 +179,7 @@ async def save_about_content(content: AboutContent):
             },
             upsert=True
         )
+        invalidate_section("about")
         
         return {"message": "✓ Zawartość About zapisana"}
     except Exception as e:
@@ -110,42 +189,15 @@ async def save_about_content(content: AboutContent):
         )
 
 @router.get("/about")
-async def get_about_content():
-    """Get about section content"""
-    db = get_db()
-    
-    default_about = {
-        "cards": [
-            {
-                "icon": "🌳",
-                "title": "Nasz Sad",
-                "description": "Znajdujący się w Srebrnej, Naruszewo, nasz sad od pokoleń uprawia świeże, pyszne jabłka."
-            },
-            {
-                "icon": "🍎",
-                "title": "Jabłka Najwyższej Jakości",
-                "description": "Uprawiamy wiele odmian jabłek, każdą wybraną ze względu na jej unikalny smak i wartość odżywczą."
-            },
-            {
-                "icon": "👨‍🌾",
-                "title": "Tradycja Rodzinna",
-                "description": "Nasza rodzina uprawia ziemię w Naruszewie od dziesięcioleci."
-            }
-        ]
-    }
+async def get_about_content(request: Request):
+    """Get about section content (cached, supports conditional GET)"""
+    db = await get_async_db()
     
     if db is None:
-        return default_about
+        return DEFAULT_ABOUT
     
     try:
-        content = db["site_content"].find_one({"section": "about"})
-        
-        if not content:
-            return default_about
-        
-        del content["_id"]
-        del content["section"]
-        return content
+        return section_response(request, await load_section(db, "about", DEFAULT_ABOUT))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -167,13 +219,13 @@ class GalleryContent(BaseModel):
 @router.post("/gallery")
 async def save_gallery_content(content: GalleryContent):
     """Save gallery content"""
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         return {"message": "✓ Content saved (dev mode)"}
     
     try:
-        db["site_content"].update_one(
+        await db["site_content"].update_one(
             {"section": "gallery"},
             {
                 "$set": {
@@ -184,6 +236,7 @@ async def save_gallery_content(content: GalleryContent):
             },
             upsert=True
         )
+        invalidate_section("gallery")
         
         return {"message": "✓ Galeria zapisana"}
     except Exception as e:
@@ -194,30 +247,15 @@ async def save_gallery_content(content: GalleryContent):
 
 
 @router.get("/gallery")
-async def get_gallery_content():
-    """Get gallery content"""
-    db = get_db()
-    
-    default_gallery = {
-        "images": [
-            {"id": "1", "title": "Widok Sadu", "description": "Piękny widok na nasz sad", "category": "orchard", "photo_url": None},
-            {"id": "2", "title": "Świeże Jabłka", "description": "Świeżo zebrane jabłka", "category": "apples", "photo_url": None},
-            {"id": "3", "title": "Czas Zbioru", "description": "Zbieranie jabłek", "category": "harvest", "photo_url": None},
-        ]
-    }
+async def get_gallery_content(request: Request):
+    """Get gallery content (cached, supports conditional GET)"""
+    db = await get_async_db()
     
     if db is None:
-        return default_gallery
+        return DEFAULT_GALLERY
     
     try:
-        content = db["site_content"].find_one({"section": "gallery"})
-        
-        if not content:
-            return default_gallery
-        
-        del content["_id"]
-        del content["section"]
-        return content
+        return section_response(request, await load_section(db, "gallery", DEFAULT_GALLERY))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,51 +1,33 @@
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+import csv
+import io
 from bson import ObjectId
-from database import get_db
-import httpx
-import asyncio
+from database import get_async_db
+from catalog import find_apples
+from pagination import keyset_pipeline, next_cursor
+from dates import mongo_now, parse_date
+from json_response import BSONJSONResponse, dumps
+from counts import listing_total, record_status_change, record_bulk_status_change, validate_total_mode
+from stats import ORDER_STATS, record_new_order_stats, record_order_stats
+from stock import STOCK_RESERVED, holds_stock, release_stock, reserve_stock
+from single_flight import single_flight, flight_key
+from slots import release_slot, reserve_slot, slot_demand, slot_for, slot_key
+from pymongo import ReturnDocument, UpdateOne
+from routing import (
+    calculate_distance,
+    calculate_distances,
+    get_route_cache_stats,
+    ORCHARD_LAT,
+    ORCHARD_LON,
+    ORCHARD_NAME,
+)
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
-# Srebrna 15 location: Srebrna 15, 09-152 Naruszewo
-ORCHARD_LAT = 52.49112601595363
-ORCHARD_LON = 20.32534254089926
-ORCHARD_NAME = "Srebrna 15, Naruszewo"
-
-async def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """
-    Calculate real route distance using OSRM (Open Source Routing Machine).
-    Returns distance in kilometers.
-    Falls back to Haversine if OSRM fails.
-    """
-    try:
-        async with httpx.AsyncClient() as client:
-            # OSRM expects [lon,lat] format
-            url = f"https://router.project-osrm.org/route/v1/driving/{lon1},{lat1};{lon2},{lat2}?overview=false"
-            response = await client.get(url, timeout=10.0)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('routes') and len(data['routes']) > 0:
-                    # Distance from OSRM is in meters
-                    distance_km = data['routes'][0]['distance'] / 1000
-                    return round(distance_km, 1)
-    except Exception as e:
-        print(f"⚠️  OSRM calculation failed: {e}, falling back to Haversine")
-    
-    # Fallback: Haversine (approximate)
-    import math
-    R = 6371  # Earth's radius in kilometers
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-    a = math.sin(delta_lat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2
-    c = 2 * math.asin(math.sqrt(a))
-    return round(R * c, 1)
-
 class AppleItem(BaseModel):
     """Apple item in order"""
     apple_id: str
@@ -83,6 +65,83 @@ class OrderResponse(BaseModel):
     delivery_fee: float
     created_at: datetime
 
+# Top-level fields of an order document that listings may project
+ORDER_FIELDS = {
+    "apples", "packaging", "customer_name", "customer_email", "customer_phone",
+    "pickup_date", "pickup_time", "pickup_slot", "status", "total_quantity_kg", "total_price",
+    "packaging_cost", "delivery", "delivery_address", "delivery_distance",
+    "delivery_fee", "created_at", "updated_at"
+}
+
+# Columns of the admin order table (covered by the 'orders_summary' and
+# 'orders_summary_by_status' indexes)
+ORDER_SUMMARY_FIELDS = [
+    "status", "customer_name", "customer_phone", "pickup_date", "pickup_time",
+    "delivery", "total_quantity_kg", "total_price", "created_at"
+]
+
+VALID_STATUSES = ["pending", "confirmed", "ready", "picked_up", "cancelled"]
+
+# Upper bound on orders touched by one bulk status update
+BULK_STATUS_MAX = 1000
+
+def validate_status(new_status: str):
+    """Reject unknown order statuses with 400"""
+    if new_status not in VALID_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Nieprawidłowy status. Musi być jeden z: {', '.join(VALID_STATUSES)}"
+        )
+
+def order_projection(view: str, fields: Optional[str]) -> Optional[list[str]]:
+    """Fields to fetch for a listing: explicit fields=, the summary view, or None for everything"""
+    if fields:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in requested if f not in ORDER_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Nieznane pola: {', '.join(unknown)}"
+            )
+        return requested
+    if view == "summary":
+        return ORDER_SUMMARY_FIELDS
+    if view != "full":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nieprawidłowy widok. Musi być jeden z: full, summary"
+        )
+    return None
+
+# Why an order couldn't claim what it needs, as shown to the customer
+CLAIM_ERRORS = {
+    "out_of_stock": "Niewystarczająca ilość jabłek w magazynie",
+    "slot_full": "Wybrany termin odbioru jest już pełny"
+}
+
+async def claim_order(db, order: dict) -> Optional[str]:
+    """
+    Reserve an order's stock and pickup slot, all or nothing.
+    
+    Returns "out_of_stock" or "slot_full" when something ran out, None
+    when both were claimed (and marks the order with STOCK_RESERVED - the
+    caller persists it).
+    """
+    if await reserve_stock(db, order.get("apples") or []):
+        return "out_of_stock"
+    if order.get("pickup_slot") and not await reserve_slot(db, order["pickup_slot"], slot_demand(order)):
+        await release_stock(db, order.get("apples") or [])
+        return "slot_full"
+    order[STOCK_RESERVED] = True
+    return None
+
+async def release_orders(db, orders: list[dict]):
+    """Give back the pickup slots held by orders, and the stock of those that reserved it"""
+    await release_stock(db, [item for order in orders if order.get(STOCK_RESERVED) for item in order.get("apples") or []])
+    for order in orders:
+        if order.get("pickup_slot"):
+            await release_slot(db, order["pickup_slot"], slot_demand(order))
+
 class DeliveryValidation(BaseModel):
     """Validate delivery possibility"""
     total_quantity_kg: int
@@ -96,6 +155,47 @@ class DeliveryValidationResponse(BaseModel):
     delivery_fee: float
     error: Optional[str]
 
+class DeliveryPoint(BaseModel):
+    """One address of a batch delivery check"""
+    ref: Optional[str] = None
+    total_quantity_kg: int
+    delivery_lat: float = Field(..., ge=-90, le=90)
+    delivery_lon: float = Field(..., ge=-180, le=180)
+
+class BatchDeliveryValidation(BaseModel):
+    """Validate delivery for many addresses at once"""
+    points: list[DeliveryPoint] = Field(..., max_length=5000)
+
+# Delivery rules (shared by order creation and both validation endpoints)
+DELIVERY_MIN_KG = 200
+DELIVERY_MAX_KM = 50
+DELIVERY_FEE = 25.0
+
+def delivery_validation(total_quantity_kg: int, distance: Optional[float]) -> DeliveryValidationResponse:
+    """Apply the delivery rules; distance may be None when the quantity already rules delivery out"""
+    if total_quantity_kg < DELIVERY_MIN_KG:
+        return DeliveryValidationResponse(
+            valid=False,
+            distance_km=None,
+            delivery_fee=0,
+            error=f"Dostawa dostępna od {DELIVERY_MIN_KG} kg jabłek"
+        )
+    
+    if distance > DELIVERY_MAX_KM:
+        return DeliveryValidationResponse(
+            valid=False,
+            distance_km=distance,
+            delivery_fee=0,
+            error=f"Adres jest za daleko ({distance:.1f} km). Maksymalna odległość to {DELIVERY_MAX_KM} km."
+        )
+    
+    return DeliveryValidationResponse(
+        valid=True,
+        distance_km=distance,
+        delivery_fee=DELIVERY_FEE,
+        error=None
+    )
+
 class OrchardConfig(BaseModel):
     """Orchard configuration"""
     lat: float
@@ -111,6 +211,11 @@ async def get_orchard_config():
         name=ORCHARD_NAME
     )
 
+@router.get("/route-cache/stats", tags=["admin"])
+async def route_cache_stats():
+    """Route distance cache hit/miss counters (admin only)"""
+    return {**get_route_cache_stats(), "single_flight": single_flight.stats()}
+
 @router.post("/validate-delivery", response_model=DeliveryValidationResponse)
 async def validate_delivery(validation: DeliveryValidation):
     """
@@ -118,37 +223,49 @@ async def validate_delivery(validation: DeliveryValidation):
     
     Requirements:
     - Minimum 200 kg
-    - Maximum 25 km distance
+    - Maximum 50 km distance
     - Delivery fee: 25 zł
+    
+    Identical concurrent checks share one distance lookup.
     """
-    # Check minimum quantity
-    if validation.total_quantity_kg < 200:
-        return DeliveryValidationResponse(
-            valid=False,
-            distance_km=None,
-            delivery_fee=0,
-            error="Dostawa dostępna od 200 kg jabłek"
-        )
+    if validation.total_quantity_kg < DELIVERY_MIN_KG:
+        return delivery_validation(validation.total_quantity_kg, None)
     
     # Calculate distance using OSRM
-    distance = await calculate_distance(ORCHARD_LAT, ORCHARD_LON, validation.delivery_lat, validation.delivery_lon)
-    
-    # Check maximum distance
-    if distance > 50:
-        return DeliveryValidationResponse(
-            valid=False,
-            distance_km=distance,
-            delivery_fee=0,
-            error=f"Adres jest za daleko ({distance:.1f} km). Maksymalna odległość to 50 km."
-        )
+    distance = await single_flight.do(
+        flight_key("POST /orders/validate-delivery", lat=validation.delivery_lat, lon=validation.delivery_lon),
+        lambda: calculate_distance(ORCHARD_LAT, ORCHARD_LON, validation.delivery_lat, validation.delivery_lon, max_km=DELIVERY_MAX_KM)
+    )
+    return delivery_validation(validation.total_quantity_kg, distance)
+
+@router.post("/validate-delivery/batch", tags=["admin"])
+async def validate_delivery_batch(batch: BatchDeliveryValidation):
+    """
+    Validate delivery for many addresses at once (admin only).
     
-    # All good
-    return DeliveryValidationResponse(
-        valid=True,
-        distance_km=distance,
-        delivery_fee=25.0,
-        error=None
+    Same rules as /validate-delivery. Distances are resolved together: the
+    distance grid and route cache first, then shared OSRM table requests,
+    then Haversine for anything OSRM can't answer.
+    """
+    routed = [i for i, point in enumerate(batch.points) if point.total_quantity_kg >= DELIVERY_MIN_KG]
+    distances = await calculate_distances(
+        ORCHARD_LAT,
+        ORCHARD_LON,
+        [(batch.points[i].delivery_lat, batch.points[i].delivery_lon) for i in routed],
+        max_km=DELIVERY_MAX_KM
     )
+    distance_by_index = dict(zip(routed, distances))
+    
+    results = [
+        {"ref": point.ref, **delivery_validation(point.total_quantity_kg, distance_by_index.get(i)).model_dump()}
+        for i, point in enumerate(batch.points)
+    ]
+    
+    return BSONJSONResponse({
+        "total": len(results),
+        "valid": sum(1 for r in results if r["valid"]),
+        "results": results
+    })
 
 @router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(order: OrderCreate):
@@ -156,8 +273,10 @@ async def create_order(order: OrderCreate):
     Create new order with multiple apple varieties.
     
     Minimum 10 kg per variety, can be increased by 5 kg increments.
+    Stock is reserved atomically per variety and the pickup time books a
+    slot (409 when a variety runs out or the slot is full).
     """
-    db = get_db()
+    db = await get_async_db()
     
     # Validate at least one apple selected
     if not order.apples or len(order.apples) == 0:
@@ -173,17 +292,24 @@ async def create_order(order: OrderCreate):
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Ilość musi wynosić co najmniej 10 kg, zwiększana co 5 kg"
             )
-    pickup_date, pickup_time = None, None
+    pickup_date, pickup_time, pickup_slot = None, None, None
     if not order.delivery:
         # Parse pickup_datetime to date and time
         pickup_dt = datetime.fromisoformat(order.pickup_datetime)
         pickup_date = pickup_dt.strftime("%Y-%m-%d")
         pickup_time = pickup_dt.strftime("%H:%M")
+        slot = slot_for(pickup_dt)
+        if slot is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Odbiór możliwy tylko w godzinach otwarcia sadu"
+            )
+        pickup_slot = slot_key(*slot)
         
     if db is None:
         # Development mode - return success
         total_qty = sum(a.quantity_kg for a in order.apples)
-        delivery_fee = 25.0 if order.delivery else 0.0
+        delivery_fee = DELIVERY_FEE if order.delivery else 0.0
         return OrderResponse(
             id="dev-mode",
             apples=[a.dict() for a in order.apples],
@@ -209,8 +335,11 @@ async def create_order(order: OrderCreate):
         total_price = 0.0
         total_quantity = 0
         
+        # One query (or a snapshot read) for every variety in the cart
+        apples_by_id = await find_apples(db, [a.apple_id for a in order.apples])
+        
         for apple_item in order.apples:
-            apple = db["apples"].find_one({"_id": ObjectId(apple_item.apple_id)})
+            apple = apples_by_id.get(apple_item.apple_id)
             if not apple:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -243,10 +372,10 @@ async def create_order(order: OrderCreate):
         
         if order.delivery:
             # Validate delivery requirements
-            if total_quantity < 200:
+            if total_quantity < DELIVERY_MIN_KG:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Dostawa dostępna od 200 kg jabłek"
+                    detail=f"Dostawa dostępna od {DELIVERY_MIN_KG} kg jabłek"
                 )
             
             if not order.delivery_address or not order.delivery_lat or not order.delivery_lon:
@@ -256,15 +385,15 @@ async def create_order(order: OrderCreate):
                 )
             
             # Calculate distance using OSRM
-            delivery_distance = await calculate_distance(ORCHARD_LAT, ORCHARD_LON, order.delivery_lat, order.delivery_lon)
+            delivery_distance = await calculate_distance(ORCHARD_LAT, ORCHARD_LON, order.delivery_lat, order.delivery_lon, max_km=DELIVERY_MAX_KM)
             
-            if delivery_distance > 50:
+            if delivery_distance > DELIVERY_MAX_KM:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Adres jest za daleko ({delivery_distance:.1f} km). Maksymalna odległość to 50 km."
+                    detail=f"Adres jest za daleko ({delivery_distance:.1f} km). Maksymalna odległość to {DELIVERY_MAX_KM} km."
                 )
             
-            delivery_fee = 25.0
+            delivery_fee = DELIVERY_FEE
             total_price += delivery_fee
         
         # Create order document
@@ -276,6 +405,7 @@ async def create_order(order: OrderCreate):
             "customer_phone": order.customer_phone,
             "pickup_date": pickup_date,
             "pickup_time": pickup_time,
+            "pickup_slot": pickup_slot,
             "status": "pending",  # pending, confirmed, ready, picked_up, cancelled
             "total_quantity_kg": total_quantity,
             "total_price": total_price,
@@ -288,8 +418,27 @@ async def create_order(order: OrderCreate):
             "updated_at": datetime.utcnow()
         }
         
+        # Claim stock and the pickup slot last, once nothing else can reject the order
+        failure = await claim_order(db, order_doc)
+        if failure:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=CLAIM_ERRORS[failure]
+            )
+        
         # Insert into database
-        result = db["orders"].insert_one(order_doc)
+        try:
+            result = await db["orders"].insert_one(order_doc)
+        except Exception:
+            await release_orders(db, [order_doc])
+            raise
+        # The order is stored - a failed counter/rollup write mustn't report it as failed
+        # (both are rebuilt: counters at startup, rollups with `python stats.py rebuild`)
+        try:
+            await record_status_change(db, "pending")
+            await record_new_order_stats(db, order_doc)
+        except Exception as e:
+            print(f"⚠️  Order bookkeeping failed for {result.inserted_id}: {e}")
         
         return OrderResponse(
             id=str(result.inserted_id),
@@ -318,52 +467,225 @@ async def create_order(order: OrderCreate):
         )
 
 @router.get("/", tags=["admin"])
-async def get_all_orders(skip: int = 0, limit: int = 100, status_filter: Optional[str] = None, new_status: Optional[str] = None):
+async def get_all_orders(skip: int = 0, limit: int = 100, status_filter: Optional[str] = None, new_status: Optional[str] = None, after: Optional[str] = None, total: str = "approx", view: str = "full", fields: Optional[str] = None):
     """
     Get all orders (admin only).
     
+    Pass the returned `next_after` token as `after` to fetch the next page
+    at constant cost; `skip` is still honoured when no cursor is given.
+    `total` is exact, approx (counters / collection metadata) or none.
+    `view=summary` or `fields=a,b,c` fetch only those columns; use
+    GET /orders/{id} for the full document.
+    
     This endpoint should be protected by authentication in production.
     """
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         return {"orders": [], "total": 0}
     
+    validate_total_mode(total)
+    
+    query = {}
+    if status_filter:
+        query["status"] = status_filter
+    
+    projection = order_projection(view, fields)
+    pipeline = keyset_pipeline(query, after, skip, limit, projection)
+    
     try:
-        query = {}
-        if status_filter:
-            query["status"] = status_filter
+        orders = await db["orders"].aggregate(pipeline).to_list(length=None)
+        total_count = await listing_total(db, "orders", query, total)
         
-        orders = list(
-            db["orders"]
-            .find(query)
-            .sort("created_at", -1)
-            .skip(skip)
-            .limit(limit)
-        )
-        
-        for order in orders:
-            order["id"] = str(order["_id"])
-            del order["_id"]
-        
-        total = db["orders"].count_documents(query)
-        
-        return {
+        # Raw documents - the response class encodes ObjectId/datetime
+        return BSONJSONResponse({
             "orders": orders,
-            "total": total,
+            "total": total_count,
             "skip": skip,
-            "limit": limit
-        }
+            "limit": limit,
+            "next_after": next_cursor(orders, limit)
+        })
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Nie udało się pobrać zamówień: {str(e)}"
         )
 
+# Columns of the order export - one row per line item
+EXPORT_ORDER_COLUMNS = [
+    "order_id", "created_at", "status", "customer_name", "customer_email",
+    "customer_phone", "pickup_date", "pickup_time", "packaging", "delivery",
+    "delivery_address", "delivery_distance", "delivery_fee", "packaging_cost",
+    "total_quantity_kg", "total_price"
+]
+EXPORT_ITEM_COLUMNS = ["apple_id", "apple_name", "quantity_kg", "price_per_kg", "subtotal"]
+EXPORT_BATCH_SIZE = 500
+
+def export_rows(order: dict):
+    """Flatten an order into one dict per line item (orders without items give one row)"""
+    base = {column: order.get(column) for column in EXPORT_ORDER_COLUMNS[1:]}
+    base = {"order_id": str(order["_id"]), **base}
+    for item in order.get("apples") or [{}]:
+        yield {**base, **{column: item.get(column) for column in EXPORT_ITEM_COLUMNS}}
+
+async def stream_export(cursor, export_format: str):
+    """Encode orders from a Mongo cursor as they arrive (constant memory)"""
+    columns = EXPORT_ORDER_COLUMNS + EXPORT_ITEM_COLUMNS
+    
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # BOM so spreadsheets pick up UTF-8 (Polish names)
+        writer.writerow(columns)
+        yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    
+    async for order in cursor:
+        if export_format == "csv":
+            buffer.seek(0)
+            buffer.truncate()
+            for row in export_rows(order):
+                writer.writerow([
+                    row[c].isoformat() if isinstance(row[c], datetime) else row[c]
+                    for c in columns
+                ])
+            yield buffer.getvalue().encode("utf-8")
+        else:
+            yield b"".join(dumps(row) + b"\n" for row in export_rows(order))
+
+@router.get("/export", tags=["admin"])
+async def export_orders(
+    format: str = "csv",
+    status_filter: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    pickup_from: Optional[str] = None,
+    pickup_to: Optional[str] = None
+):
+    """
+    Export orders as CSV or NDJSON, one row per line item (admin only).
+    
+    Streams straight from a Mongo cursor, so memory use doesn't grow with
+    the export. Dates are YYYY-MM-DD; ranges are inclusive.
+    """
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nieprawidłowy format. Musi być jeden z: csv, ndjson"
+        )
+    
+    query = {}
+    if status_filter:
+        validate_status(status_filter)
+        query["status"] = status_filter
+    
+    created_start = parse_date(created_from, "created_from")
+    created_end = parse_date(created_to, "created_to")
+    if created_start or created_end:
+        query["created_at"] = {}
+        if created_start:
+            query["created_at"]["$gte"] = created_start
+        if created_end:
+            query["created_at"]["$lt"] = created_end + timedelta(days=1)
+    
+    # pickup_date is stored as YYYY-MM-DD, so string comparison is date order
+    # (bounds are normalised to that form - '2026-1-5' would sort wrong)
+    pickup_start = parse_date(pickup_from, "pickup_from")
+    pickup_end = parse_date(pickup_to, "pickup_to")
+    if pickup_start or pickup_end:
+        query["pickup_date"] = {}
+        if pickup_start:
+            query["pickup_date"]["$gte"] = pickup_start.strftime("%Y-%m-%d")
+        if pickup_end:
+            query["pickup_date"]["$lte"] = pickup_end.strftime("%Y-%m-%d")
+    
+    db = await get_async_db()
+    
+    if db is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Brak połączenia z bazą danych"
+        )
+    
+    cursor = db["orders"].find(query).sort([("created_at", 1), ("_id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"zamowienia-{datetime.utcnow().strftime('%Y%m%d')}.{format}"
+    
+    return StreamingResponse(
+        stream_export(cursor, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/stats", tags=["admin"])
+async def get_order_stats(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    status_filter: Optional[str] = None,
+    apple_id: Optional[str] = None
+):
+    """
+    Sales statistics by day, variety and status (admin only).
+    
+    Reads the 'order_stats' rollups instead of scanning orders. Dates are
+    order creation days (YYYY-MM-DD, inclusive, last 7 days by default).
+    Variety totals leave out cancelled orders unless status_filter is set.
+    """
+    start = parse_date(date_from, "date_from")
+    end = parse_date(date_to, "date_to") or datetime.utcnow()
+    if start is None:
+        start = end - timedelta(days=6)
+    
+    query = {"day": {"$gte": start.strftime("%Y-%m-%d"), "$lte": end.strftime("%Y-%m-%d")}}
+    if status_filter:
+        validate_status(status_filter)
+        query["status"] = status_filter
+    if apple_id:
+        query["apple_id"] = apple_id
+    
+    db = await get_async_db()
+    
+    if db is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Brak połączenia z bazą danych"
+        )
+    
+    try:
+        rows = await db[ORDER_STATS].find(
+            {**query, "line_items": {"$gt": 0}},
+            {"_id": 0}
+        ).sort([("day", 1), ("apple_name", 1), ("status", 1)]).to_list(length=None)
+    
+        varieties: dict[str, dict] = {}
+        for row in rows:
+            if not status_filter and row["status"] == "cancelled":
+                continue
+            variety = varieties.setdefault(row["apple_id"], {
+                "apple_id": row["apple_id"],
+                "apple_name": row["apple_name"],
+                "quantity_kg": 0,
+                "revenue": 0
+            })
+            variety["quantity_kg"] += row["quantity_kg"]
+            variety["revenue"] += row["revenue"]
+    
+        return {
+            "date_from": query["day"]["$gte"],
+            "date_to": query["day"]["$lte"],
+            "rows": rows,
+            "varieties": sorted(varieties.values(), key=lambda v: -v["quantity_kg"])
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Nie udało się pobrać statystyk: {str(e)}"
+        )
+
 @router.get("/{order_id}", tags=["admin"])
 async def get_order(order_id: str):
     """Get specific order by ID (admin only)"""
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         raise HTTPException(
@@ -372,7 +694,7 @@ async def get_order(order_id: str):
         )
     
     try:
-        order = db["orders"].find_one({"_id": ObjectId(order_id)})
+        order = await db["orders"].find_one({"_id": ObjectId(order_id)})
         
         if not order:
             raise HTTPException(
@@ -394,22 +716,27 @@ class StatusUpdate(BaseModel):
     """Update order status"""
     new_status: str
 
+class BulkStatusUpdate(BaseModel):
+    """Update status of many orders - by id list, or by filter"""
+    new_status: str
+    order_ids: Optional[list[str]] = Field(default=None, max_length=BULK_STATUS_MAX)
+    # Filter mode: orders currently in this status (and optionally for this pickup date)
+    current_status: Optional[str] = None
+    pickup_date: Optional[str] = None
+
 @router.put("/{order_id}/status", tags=["admin"])
 async def update_order_status(order_id: str, status_update: StatusUpdate):
     """
     Update order status (admin only).
     
     Valid statuses: pending, confirmed, ready, picked_up, cancelled
-    """
-    valid_statuses = ["pending", "confirmed", "ready", "picked_up", "cancelled"]
     
-    if status_update.new_status not in valid_statuses:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Nieprawidłowy status. Musi być jeden z: {', '.join(valid_statuses)}"
-        )
+    Cancelling releases the order's reserved stock and pickup slot; taking
+    an order out of "cancelled" reserves them again (409 when it can't).
+    """
+    validate_status(status_update.new_status)
     
-    db = get_db()
+    db = await get_async_db()
     
     if db is None:
         raise HTTPException(
@@ -418,29 +745,196 @@ async def update_order_status(order_id: str, status_update: StatusUpdate):
         )
     
     try:
-        result = db["orders"].update_one(
+        # Stored timestamp, matched exactly when the change is undone below
+        changes = {
+            "status": status_update.new_status,
+            "updated_at": mongo_now()
+        }
+        previous_order = await db["orders"].find_one_and_update(
             {"_id": ObjectId(order_id)},
-            {
-                "$set": {
-                    "status": status_update.new_status,
-                    "updated_at": datetime.utcnow()
-                }
-            }
+            {"$set": changes},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
+        if previous_order is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Zamówienie nie znalezione"
             )
         
-        updated_order = db["orders"].find_one({"_id": ObjectId(order_id)})
+        was_holding = holds_stock(previous_order.get("status"))
+        if was_holding and not holds_stock(status_update.new_status):
+            await release_orders(db, [previous_order])
+        elif not was_holding and holds_stock(status_update.new_status):
+            # Reactivated order - it needs its stock and slot back, or the change is undone
+            failure = await claim_order(db, previous_order)
+            if failure:
+                await db["orders"].update_one(
+                    {"_id": previous_order["_id"], **changes},
+                    {"$set": {"status": previous_order.get("status"), "updated_at": previous_order.get("updated_at")}}
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=CLAIM_ERRORS[failure]
+                )
+            await db["orders"].update_one({"_id": previous_order["_id"]}, {"$set": {STOCK_RESERVED: True}})
+        
+        await record_status_change(db, status_update.new_status, previous_order.get("status"))
+        await record_order_stats(db, [previous_order], status_update.new_status)
+        
+        updated_order = {**previous_order, **changes}
         updated_order["id"] = str(updated_order["_id"])
         del updated_order["_id"]
         
         return updated_order
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Nie udało się zaktualizować zamówienia: {str(e)}"
         )
+
+@router.post("/bulk/status", tags=["admin"])
+async def bulk_update_order_status(bulk_update: BulkStatusUpdate):
+    """
+    Update the status of many orders at once (admin only).
+    
+    Targets either `order_ids` or every order matching `current_status`
+    (and `pickup_date`, if given), up to BULK_STATUS_MAX orders. Same statuses as the single-order
+    endpoint. Applied with one bulk write; each order is only moved from
+    the status it was read with, so concurrent edits show up as "conflict".
+    
+    Cancelling releases the orders' reserved stock and pickup slots; orders
+    taken out of "cancelled" reserve them again and are reported as
+    "out_of_stock" or "slot_full" when they can't.
+    
+    Per-order results: updated, unchanged, not_found, invalid_id, conflict, out_of_stock, slot_full.
+    """
+    validate_status(bulk_update.new_status)
+    
+    if bulk_update.order_ids is None and bulk_update.current_status is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Podaj order_ids albo current_status"
+        )
+    
+    if bulk_update.current_status is not None:
+        validate_status(bulk_update.current_status)
+    
+    db = await get_async_db()
+    
+    if db is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Brak połączenia z bazą danych"
+        )
+    
+    results: dict[str, str] = {}
+    
+    if bulk_update.order_ids is not None:
+        object_ids = []
+        for order_id in bulk_update.order_ids:
+            if ObjectId.is_valid(order_id):
+                object_ids.append(ObjectId(order_id))
+                results[str(ObjectId(order_id))] = "not_found"
+            else:
+                results[order_id] = "invalid_id"
+        query = {"_id": {"$in": object_ids}}
+    else:
+        query = {"status": bulk_update.current_status}
+        if bulk_update.pickup_date:
+            query["pickup_date"] = bulk_update.pickup_date
+    
+    try:
+        # Current statuses of every targeted order (one round trip), plus
+        # what the sales rollups and stock/slot reservations need
+        targets = await db["orders"].find(
+            query,
+            {"status": 1, "created_at": 1, "apples": 1, "pickup_slot": 1, "total_quantity_kg": 1, STOCK_RESERVED: 1}
+        ).to_list(length=BULK_STATUS_MAX)
+        
+        # Stored timestamp, matched exactly below
+        changes = {
+            "status": bulk_update.new_status,
+            "updated_at": mongo_now()
+        }
+        ops = []
+        previous_status = {}
+        targets_by_id = {}
+        claimed = []
+        
+        try:
+            for order in targets:
+                order_id = str(order["_id"])
+                if order.get("status") == bulk_update.new_status:
+                    results[order_id] = "unchanged"
+                    continue
+                if not holds_stock(order.get("status")) and holds_stock(bulk_update.new_status):
+                    # Reactivating a cancelled order claims its stock and slot first
+                    failure = await claim_order(db, order)
+                    if failure:
+                        results[order_id] = failure
+                        continue
+                    claimed.append(order)
+                previous_status[order_id] = order.get("status")
+                targets_by_id[order_id] = order
+                # Reactivated orders are marked as holding stock in the same write
+                ops.append(UpdateOne(
+                    {"_id": order["_id"], "status": order.get("status")},
+                    {"$set": {**changes, STOCK_RESERVED: True} if order.get(STOCK_RESERVED) else changes}
+                ))
+            
+            result = await db["orders"].bulk_write(ops, ordered=False) if ops else None
+        except Exception:
+            # Don't leak the stock and slots claimed so far
+            await release_orders(db, claimed)
+            raise
+        
+        if result is not None:
+            if result.modified_count == len(ops):
+                updated_ids = set(previous_status)
+            else:
+                # Some orders changed status under us - find out which writes landed
+                landed = await db["orders"].find(
+                    {"_id": {"$in": [ObjectId(i) for i in previous_status]}, "updated_at": changes["updated_at"], "status": bulk_update.new_status},
+                    {"_id": 1}
+                ).to_list(length=None)
+                updated_ids = {str(order["_id"]) for order in landed}
+            
+            moved: dict[str, int] = {}
+            for order_id, old_status in previous_status.items():
+                if order_id in updated_ids:
+                    results[order_id] = "updated"
+                    moved[old_status] = moved.get(old_status, 0) + 1
+                else:
+                    results[order_id] = "conflict"
+            
+            await record_bulk_status_change(db, bulk_update.new_status, moved)
+            await record_order_stats(
+                db,
+                [targets_by_id[order_id] for order_id in previous_status if order_id in updated_ids],
+                bulk_update.new_status
+            )
+            
+            # Cancelled orders give their stock and slot back; so do reactivations whose write didn't land
+            released = []
+            for order_id, order in targets_by_id.items():
+                if holds_stock(bulk_update.new_status):
+                    if order_id not in updated_ids and not holds_stock(order.get("status")):
+                        released.append(order)
+                elif order_id in updated_ids and holds_stock(order.get("status")):
+                    released.append(order)
+            await release_orders(db, released)
+        
+        return {
+            "new_status": bulk_update.new_status,
+            "matched": len(targets),
+            "updated": sum(1 for r in results.values() if r == "updated"),
+            "results": [{"id": order_id, "result": result} for order_id, result in results.items()]
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Nie udało się zaktualizować zamówień: {str(e)}"
+        )
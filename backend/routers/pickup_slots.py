@@ -0,0 +1,100 @@
+from fastapi import APIRouter, HTTPException, status
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime, timedelta
+from database import get_async_db
+from dates import parse_date
+from slots import (
+    PICKUP_SLOTS,
+    PICKUP_SLOT_CAPACITY,
+    PICKUP_SLOT_MINUTES,
+    PICKUP_SLOT_UNIT,
+    PICKUP_MAX_RANGE_DAYS,
+    slot_availability,
+    slot_key,
+    slot_times,
+)
+
+router = APIRouter(prefix="/pickup-slots", tags=["pickup-slots"])
+
+class SlotCapacityUpdate(BaseModel):
+    """Capacity of one pickup slot"""
+    capacity: int = Field(..., ge=0)
+
+@router.get("/")
+async def get_pickup_slots(date_from: Optional[str] = None, date_to: Optional[str] = None):
+    """
+    Pickup slots with their free capacity (default: the next 7 days).
+    
+    Dates are YYYY-MM-DD, inclusive, at most PICKUP_MAX_RANGE_DAYS apart.
+    """
+    start = (parse_date(date_from, "date_from") or datetime.utcnow()).date()
+    end = parse_date(date_to, "date_to").date() if date_to else start + timedelta(days=6)
+    
+    if end < start or (end - start).days >= PICKUP_MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Zakres dat musi obejmować od 1 do {PICKUP_MAX_RANGE_DAYS} dni"
+        )
+    
+    db = await get_async_db()
+    
+    if db is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Brak połączenia z bazą danych"
+        )
+    
+    try:
+        return {
+            "unit": PICKUP_SLOT_UNIT,
+            "slot_minutes": PICKUP_SLOT_MINUTES,
+            "slots": await slot_availability(db, start, end)
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Nie udało się pobrać terminów odbioru: {str(e)}"
+        )
+
+@router.put("/{slot_date}/{slot_time}", tags=["admin"])
+async def set_slot_capacity(slot_date: str, slot_time: str, update: SlotCapacityUpdate):
+    """
+    Override the capacity of one slot (admin only).
+    
+    0 closes the slot. Bookings already made are kept even if they now
+    exceed the capacity; the slot just stops taking new ones.
+    """
+    # Normalised, so '2026-1-5' names the same slot as '2026-01-05'
+    slot_date = parse_date(slot_date, "slot_date").strftime("%Y-%m-%d")
+    if slot_time not in slot_times():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nieprawidłowa godzina terminu odbioru"
+        )
+    
+    db = await get_async_db()
+    
+    if db is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Brak połączenia z bazą danych"
+        )
+    
+    try:
+        key = slot_key(slot_date, slot_time)
+        await db[PICKUP_SLOTS].update_one(
+            {"_id": key},
+            {
+                "$set": {"capacity": update.capacity},
+                "$setOnInsert": {"date": slot_date, "time": slot_time, "booked": 0}
+            },
+            upsert=True
+        )
+        slot = await db[PICKUP_SLOTS].find_one({"_id": key}, {"_id": 0})
+        return {**slot, "default_capacity": PICKUP_SLOT_CAPACITY}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Nie udało się zmienić pojemności terminu: {str(e)}"
+        )
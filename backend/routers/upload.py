@@ -1,8 +1,15 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
+from multipart.multipart import MultipartParser, parse_options_header
+from images import create_variants, load_variants, manifest_name
+from database import get_async_db
 import os
+import re
+import glob
 import shutil
+import asyncio
+import hashlib
+import tempfile
 from datetime import datetime
-import uuid
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
@@ -11,6 +18,9 @@ UPLOAD_DIR = "uploads"
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
 
+# Slack for multipart boundaries/headers when pre-checking Content-Length
+MULTIPART_OVERHEAD = 16 * 1024
+
 # Create uploads directory if it doesn't exist
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
@@ -18,48 +28,193 @@ def allowed_file(filename: str) -> bool:
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@router.post("")
-async def upload_file(file: UploadFile = File(...)):
+def file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Plik za duży. Maximum: 5MB"
+    )
+
+class FilePartReceiver:
     """
-    Upload an image file.
+    Multipart parser callbacks collecting the 'file' field as it streams in.
     
-    Supported formats: jpg, jpeg, png, gif, webp
-    Max size: 5MB
+    Data is buffered only until the caller flushes it to disk, and the size
+    limit is enforced per chunk. The SHA-256 is computed on the fly.
     """
-    try:
-        if not file.filename:
+    
+    def __init__(self):
+        self.filename = None
+        self.size = 0
+        self.hasher = hashlib.sha256()
+        self.pending: list[bytes] = []
+        self._in_file_part = False
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+    
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+    
+    def on_part_begin(self):
+        self._headers = {}
+    
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+    
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+    
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+    
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._in_file_part = options.get(b"name") == b"file" and self.filename is None
+        if not self._in_file_part:
+            return
+        
+        self.filename = options.get(b"filename", b"").decode("utf-8", errors="replace")
+        
+        if not self.filename:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Nazwa pliku jest wymagana"
             )
         
-        if not allowed_file(file.filename):
+        if not allowed_file(self.filename):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Nieobsługiwany format pliku. Obsługiwane: jpg, jpeg, png, gif, webp"
             )
+    
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if not self._in_file_part:
+            return
+        self.size += end - start
+        if self.size > MAX_FILE_SIZE:
+            raise file_too_large()
+        chunk = bytes(data[start:end])
+        self.hasher.update(chunk)
+        self.pending.append(chunk)
+    
+    def on_part_end(self):
+        self._in_file_part = False
+
+async def receive_upload(request: Request) -> tuple[str, str, int, str]:
+    """
+    Stream the 'file' field of a multipart request into a temp file in UPLOAD_DIR.
+    
+    Returns (original filename, temp file path, size, sha256 hex). Oversized
+    uploads are rejected as soon as the limit is crossed; disk writes run in
+    a worker thread.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+        raise file_too_large()
+    
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Oczekiwano przesłania pliku (multipart/form-data)"
+        )
+    
+    receiver = FilePartReceiver()
+    parser = MultipartParser(boundary, receiver.callbacks())
+    
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-", suffix=".part")
+    temp_file = os.fdopen(fd, "wb")
+    
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if receiver.pending:
+                data = b"".join(receiver.pending)
+                receiver.pending.clear()
+                await asyncio.to_thread(temp_file.write, data)
+        parser.finalize()
+        await asyncio.to_thread(temp_file.close)
+    except BaseException:
+        temp_file.close()
+        os.remove(temp_path)
+        raise
+    
+    if receiver.filename is None:
+        os.remove(temp_path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nazwa pliku jest wymagana"
+        )
+    
+    return receiver.filename, temp_path, receiver.size, receiver.hasher.hexdigest()
+
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"]
+                }
+            }
+        }
+    }
+}
+
+@router.post("", openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_file(request: Request):
+    """
+    Upload an image file.
+    
+    Supported formats: jpg, jpeg, png, gif, webp
+    Max size: 5MB
+    
+    The body is streamed to a temp file and stored under its SHA-256, so
+    identical uploads share one file (and one set of variants) and the URL
+    can be cached forever. Resized WebP/AVIF variants are returned as a
+    srcset manifest.
+    """
+    try:
+        filename, temp_path, size, digest = await receive_upload(request)
         
-        # Read file
-        contents = await file.read()
-        
-        # Check file size
-        if len(contents) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"Plik za duży. Maximum: 5MB"
-            )
-        
-        # Generate unique filename
-        file_extension = file.filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
+        # Content-addressed filename (jpeg/jpg normalised so they dedupe too)
+        file_extension = filename.rsplit('.', 1)[1].lower()
+        if file_extension == "jpeg":
+            file_extension = "jpg"
+        unique_filename = f"{digest}.{file_extension}"
         file_path = os.path.join(UPLOAD_DIR, unique_filename)
         
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(file_path) or UPLOAD_DIR, exist_ok=True)
+        deduplicated = os.path.exists(file_path)
+        
+        try:
+            if deduplicated:
+                await asyncio.to_thread(os.remove, temp_path)
+            else:
+                # Move into place (same directory, so the rename is atomic)
+                await asyncio.to_thread(os.replace, temp_path, file_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
         
-        # Save file
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        # Responsive variants (process pool; empty if the image can't be processed)
+        stem = digest
+        manifest = await asyncio.to_thread(load_variants, UPLOAD_DIR, stem, "/uploads") if deduplicated else None
+        if manifest is None:
+            manifest = await create_variants(file_path, UPLOAD_DIR, stem, "/uploads")
         
         # Return URL
         file_url = f"/uploads/{unique_filename}"
@@ -67,7 +222,11 @@ async def upload_file(file: UploadFile = File(...)):
         return {
             "url": file_url,
             "filename": unique_filename,
-            "size": len(contents),
+            "size": size,
+            "sha256": digest,
+            "deduplicated": deduplicated,
+            "variants": manifest["variants"],
+            "srcset": manifest["srcset"],
             "message": "✓ Plik wgrany pomyślnie"
         }
     
@@ -80,11 +239,35 @@ async def upload_file(file: UploadFile = File(...)):
             detail=f"Błąd przy wgrywaniu pliku: {str(e)}"
         )
 
+async def upload_references(stem: str) -> list[str]:
+    """Apples and site content sections still pointing at an upload (or its variants)"""
+    db = await get_async_db()
+    if db is None:
+        return []
+    
+    pattern = {"$regex": f"/uploads/{re.escape(stem)}(\\.|-\\d+w\\.)"}
+    references = [
+        f"odmiana {apple.get('name')}"
+        async for apple in db["apples"].find({"photo_url": pattern}, {"name": 1})
+    ]
+    references += [
+        f"sekcja {content.get('section')}"
+        async for content in db["site_content"].find(
+            {"$or": [{"background_image": pattern}, {"images.photo_url": pattern}]},
+            {"section": 1}
+        )
+    ]
+    return references
+
 @router.delete("/{filename}")
 async def delete_file(filename: str):
     """
     Delete an uploaded image file (admin only).
     
+    Uploads are deduplicated by content, so the same file may be referenced
+    from several places (apple photo, gallery, hero) - it's only removed
+    once nothing references it (409 otherwise).
+    
     This endpoint should be protected by authentication in production.
     """
     try:
@@ -103,8 +286,23 @@ async def delete_file(filename: str):
                 detail="Plik nie znaleziony"
             )
         
+        stem = filename.rsplit('.', 1)[0]
+        references = await upload_references(stem)
+        if references:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Plik jest nadal używany: {', '.join(references)}"
+            )
+        
         os.remove(file_path)
         
+        # Remove responsive variants generated for this upload
+        for variant_path in glob.glob(os.path.join(UPLOAD_DIR, f"{glob.escape(stem)}-*w.*")):
+            os.remove(variant_path)
+        manifest_path = os.path.join(UPLOAD_DIR, manifest_name(stem))
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        
         return {"message": "✓ Plik usunięty"}
     
     except HTTPException:
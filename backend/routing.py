@@ -0,0 +1,290 @@
+import os
+import math
+import asyncio
+from datetime import datetime
+from typing import Optional
+from dotenv import load_dotenv
+from cache import TTLCache
+from circuit_breaker import CircuitBreaker
+from database import get_async_db
+from http_client import get_http_client
+from distance_grid import get_distance_grid
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+load_dotenv()
+
+# Srebrna 15 location: Srebrna 15, 09-152 Naruszewo
+ORCHARD_LAT = 52.49112601595363
+ORCHARD_LON = 20.32534254089926
+ORCHARD_NAME = "Srebrna 15, Naruszewo"
+
+# OSRM routing service (override to point at a self-hosted instance or a local stub)
+OSRM_URL = os.getenv("OSRM_URL", "https://router.project-osrm.org").rstrip("/")
+
+# Longest an OSRM call may take before falling back to Haversine (seconds)
+OSRM_LATENCY_BUDGET = float(os.getenv("OSRM_LATENCY_BUDGET", "2.0"))
+
+# Consecutive OSRM failures that open the breaker, and how long it stays open (seconds)
+OSRM_BREAKER_FAILURES = int(os.getenv("OSRM_BREAKER_FAILURES", "5"))
+OSRM_BREAKER_COOLDOWN = float(os.getenv("OSRM_BREAKER_COOLDOWN", "30"))
+
+# Road snapping can shorten a route slightly below the straight line, so
+# only points this far beyond the limit are rejected without routing
+PREFILTER_MARGIN_KM = 1.0
+
+# Most coordinates one OSRM table request may carry (osrm-routed --max-table-size)
+OSRM_TABLE_MAX_SIZE = int(os.getenv("OSRM_TABLE_MAX_SIZE", "100"))
+# Table requests (admin batch checks) get their own, longer budget and a
+# cap on how many run at once, so a big batch can't starve customer checks
+OSRM_TABLE_LATENCY_BUDGET = float(os.getenv("OSRM_TABLE_LATENCY_BUDGET", "10.0"))
+OSRM_TABLE_CONCURRENCY = int(os.getenv("OSRM_TABLE_CONCURRENCY", "2"))
+
+# Route cache: coordinates are snapped to a grid (in degrees, 0.001 ≈ 100 m)
+ROUTE_CACHE_GRID = float(os.getenv("ROUTE_CACHE_GRID", "0.001"))
+ROUTE_CACHE_TTL = float(os.getenv("ROUTE_CACHE_TTL", "3600"))
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "2048"))
+
+# First tier: in-process LRU. Second tier: Mongo 'route_cache' collection
+route_cache = TTLCache(max_entries=ROUTE_CACHE_MAX_ENTRIES, ttl=ROUTE_CACHE_TTL)
+route_cache_counters = {"prefiltered": 0, "grid_hits": 0, "memory_hits": 0, "db_hits": 0, "misses": 0, "budget_exceeded": 0}
+
+osrm_breaker = CircuitBreaker(failure_threshold=OSRM_BREAKER_FAILURES, cooldown=OSRM_BREAKER_COOLDOWN)
+# Separate breaker for table requests: failing batches don't open the one customers go through
+osrm_table_breaker = CircuitBreaker(failure_threshold=OSRM_BREAKER_FAILURES, cooldown=OSRM_BREAKER_COOLDOWN)
+osrm_table_slots = asyncio.Semaphore(max(OSRM_TABLE_CONCURRENCY, 1))
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in kilometers"""
+    R = 6371  # Earth's radius in kilometers
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+    a = math.sin(delta_lat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2
+    c = 2 * math.asin(math.sqrt(a))
+    return round(R * c, 1)
+
+def haversine_many(lat: float, lon: float, points: list[tuple[float, float]]) -> list[float]:
+    """Great-circle distances in kilometers from one point to many (vectorized with NumPy when installed)"""
+    if numpy is None or not points:
+        return [haversine_distance(lat, lon, p_lat, p_lon) for p_lat, p_lon in points]
+    coords = numpy.radians(numpy.asarray(points, dtype=float))
+    lat_rad = math.radians(lat)
+    delta_lat = coords[:, 0] - lat_rad
+    delta_lon = coords[:, 1] - math.radians(lon)
+    a = numpy.sin(delta_lat / 2) ** 2 + math.cos(lat_rad) * numpy.cos(coords[:, 0]) * numpy.sin(delta_lon / 2) ** 2
+    return numpy.round(6371 * 2 * numpy.arcsin(numpy.sqrt(a)), 1).tolist()
+
+def route_cache_key(lat1: float, lon1: float, lat2: float, lon2: float) -> str:
+    """Cache key from coordinates snapped to the ROUTE_CACHE_GRID cells"""
+    cells = [round(v / ROUTE_CACHE_GRID) for v in (lat1, lon1, lat2, lon2)]
+    return f"{ROUTE_CACHE_GRID}|{cells[0]},{cells[1]};{cells[2]},{cells[3]}"
+
+async def osrm_get(url: str, params: Optional[dict] = None, breaker: CircuitBreaker = osrm_breaker, budget: float = OSRM_LATENCY_BUDGET):
+    """
+    GET from OSRM within a latency budget, through a circuit breaker.
+
+    Returns the response, or None when the breaker is open, the budget ran
+    out or the request failed. Timeouts, connection errors and 5xx/429
+    answers count as failures.
+    """
+    if not breaker.allow():
+        return None
+
+    try:
+        response = await asyncio.wait_for(get_http_client().get(url, params=params), timeout=budget)
+    except asyncio.TimeoutError:
+        route_cache_counters["budget_exceeded"] += 1
+        breaker.record_failure()
+        print(f"⚠️  OSRM took longer than {budget}s, falling back to Haversine")
+        return None
+    except Exception as e:
+        breaker.record_failure()
+        print(f"⚠️  OSRM request failed: {e}, falling back to Haversine")
+        return None
+
+    if response.status_code >= 500 or response.status_code == 429:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+async def fetch_osrm_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> Optional[float]:
+    """Route distance in kilometers from OSRM, or None if it couldn't be computed"""
+    # OSRM expects [lon,lat] format
+    response = await osrm_get(f"{OSRM_URL}/route/v1/driving/{lon1},{lat1};{lon2},{lat2}?overview=false")
+
+    try:
+        if response is not None and response.status_code == 200:
+            data = response.json()
+            if data.get('routes') and len(data['routes']) > 0:
+                # Distance from OSRM is in meters
+                distance_km = data['routes'][0]['distance'] / 1000
+                return round(distance_km, 1)
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"⚠️  OSRM calculation failed: {e}, falling back to Haversine")
+
+    return None
+
+async def fetch_osrm_table_batch(lat: float, lon: float, points: list[tuple[float, float]]) -> list[Optional[float]]:
+    """Route distances in kilometers from one point to up to OSRM_TABLE_MAX_SIZE - 1 others (None where unknown)"""
+    coordinates = ";".join(f"{p_lon},{p_lat}" for p_lat, p_lon in [(lat, lon)] + points)
+    async with osrm_table_slots:
+        response = await osrm_get(
+            f"{OSRM_URL}/table/v1/driving/{coordinates}",
+            {"sources": 0, "annotations": "distance"},
+            breaker=osrm_table_breaker,
+            budget=OSRM_TABLE_LATENCY_BUDGET
+        )
+
+    try:
+        if response is not None and response.status_code == 200:
+            distances = response.json().get("distances", [[]])[0][1:]
+            if len(distances) == len(points):
+                return [round(d / 1000, 1) if d is not None else None for d in distances]
+    except (ValueError, IndexError, TypeError) as e:
+        print(f"⚠️  OSRM table request failed: {e}, falling back to Haversine")
+
+    return [None] * len(points)
+
+async def fetch_osrm_table(lat: float, lon: float, points: list[tuple[float, float]]) -> list[Optional[float]]:
+    """
+    Route distances from one point to many, in as few OSRM table requests
+    as the size limit allows (at most OSRM_TABLE_CONCURRENCY at a time)
+    """
+    size = max(OSRM_TABLE_MAX_SIZE - 1, 1)
+    batches = await asyncio.gather(*(
+        fetch_osrm_table_batch(lat, lon, points[start:start + size])
+        for start in range(0, len(points), size)
+    ))
+    return [distance for batch in batches for distance in batch]
+
+async def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float, max_km: Optional[float] = None) -> float:
+    """
+    Calculate real route distance using OSRM (Open Source Routing Machine).
+    Returns distance in kilometers.
+
+    With max_km, points whose straight-line distance is already clearly
+    beyond it get that distance back without any lookup (roads are never
+    shorter). OSRM calls are bounded by the latency budget and skipped
+    while the circuit breaker is open.
+
+    Distances from the orchard come from the precomputed distance grid
+    when it has been built (no network). Other results are cached in memory
+    and in the 'route_cache' collection, keyed by snapped coordinates.
+    Falls back to Haversine if OSRM fails (fallback values are never cached).
+    """
+    if max_km is not None:
+        straight = haversine_distance(lat1, lon1, lat2, lon2)
+        if straight > max_km + PREFILTER_MARGIN_KM:
+            route_cache_counters["prefiltered"] += 1
+            return straight
+
+    grid = get_distance_grid()
+    if grid is not None and grid.covers_origin(lat1, lon1):
+        distance = grid.lookup(lat2, lon2)
+        if distance is not None:
+            route_cache_counters["grid_hits"] += 1
+            return distance
+
+    key = route_cache_key(lat1, lon1, lat2, lon2)
+
+    distance = route_cache.get(key)
+    if distance is not None:
+        route_cache_counters["memory_hits"] += 1
+        return distance
+
+    db = await get_async_db()
+
+    if db is not None:
+        try:
+            cached = await db["route_cache"].find_one({"_id": key})
+            if cached:
+                route_cache_counters["db_hits"] += 1
+                route_cache.set(key, cached["distance_km"])
+                return cached["distance_km"]
+        except Exception as e:
+            print(f"⚠️  Route cache lookup failed: {e}")
+
+    route_cache_counters["misses"] += 1
+    distance = await fetch_osrm_distance(lat1, lon1, lat2, lon2)
+
+    if distance is None:
+        # Fallback: Haversine (approximate)
+        return haversine_distance(lat1, lon1, lat2, lon2)
+
+    route_cache.set(key, distance)
+    if db is not None:
+        try:
+            await db["route_cache"].update_one(
+                {"_id": key},
+                {"$set": {"distance_km": distance, "created_at": datetime.utcnow()}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"⚠️  Route cache write failed: {e}")
+
+    return distance
+
+async def calculate_distances(lat1: float, lon1: float, points: list[tuple[float, float]], max_km: Optional[float] = None) -> list[float]:
+    """
+    Distances in kilometers from one point to many.
+
+    With max_km, points clearly beyond it are answered by the straight-line
+    distance, as in calculate_distance. Each other point is answered by the distance grid or the in-memory route cache
+    when possible; the rest share OSRM table requests, and whatever OSRM
+    can't answer falls back to Haversine (vectorized with NumPy).
+    """
+    distances: list[Optional[float]] = [None] * len(points)
+
+    if max_km is not None:
+        for i, straight in enumerate(haversine_many(lat1, lon1, points)):
+            if straight > max_km + PREFILTER_MARGIN_KM:
+                distances[i] = straight
+                route_cache_counters["prefiltered"] += 1
+
+    grid = get_distance_grid()
+    if grid is not None and grid.covers_origin(lat1, lon1):
+        for i, (lat2, lon2) in enumerate(points):
+            if distances[i] is None:
+                distances[i] = grid.lookup(lat2, lon2)
+                if distances[i] is not None:
+                    route_cache_counters["grid_hits"] += 1
+
+    for i, (lat2, lon2) in enumerate(points):
+        if distances[i] is None:
+            distances[i] = route_cache.get(route_cache_key(lat1, lon1, lat2, lon2))
+            if distances[i] is not None:
+                route_cache_counters["memory_hits"] += 1
+
+    missing = [i for i, d in enumerate(distances) if d is None]
+    if missing:
+        route_cache_counters["misses"] += len(missing)
+        fetched = await fetch_osrm_table(lat1, lon1, [points[i] for i in missing])
+        # Not written to the route cache: one large batch would evict the entries orders rely on
+        for i, distance in zip(missing, fetched):
+            distances[i] = distance
+
+    missing = [i for i, d in enumerate(distances) if d is None]
+    if missing:
+        # Fallback: Haversine (approximate, not cached)
+        for i, distance in zip(missing, haversine_many(lat1, lon1, [points[i] for i in missing])):
+            distances[i] = distance
+
+    return distances
+
+def get_route_cache_stats() -> dict:
+    """Route cache hit/miss counters"""
+    grid = get_distance_grid()
+    return {
+        **route_cache_counters,
+        "grid": ROUTE_CACHE_GRID,
+        "memory": route_cache.stats(),
+        "osrm_breaker": osrm_breaker.stats(),
+        "osrm_table_breaker": osrm_table_breaker.stats(),
+        "distance_grid": grid.stats() if grid is not None else None
+    }
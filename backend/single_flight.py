@@ -0,0 +1,51 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+def flight_key(route: str, **params) -> tuple:
+    """Coalescing key: the route plus its parameters (in any order)"""
+    return (route, tuple(sorted(params.items())))
+
+class SingleFlight:
+    """
+    Request coalescing: concurrent calls with the same key share one
+    in-flight computation instead of each doing the work.
+
+    The computation runs as its own task, so a caller that goes away (client
+    disconnect) doesn't cancel it for the others. Results aren't kept once
+    it finishes - pair with a cache for that.
+    """
+
+    def __init__(self):
+        self.started = 0
+        self.shared = 0
+        self._flights: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn() - or the identical call already in flight for key"""
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._landed(key, done))
+            self.started += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _landed(self, key: Hashable, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Mark the exception retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """Computations started vs. calls that joined one in flight"""
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "shared": self.shared
+        }
+
+# Shared by the hot read paths (keys start with the route, so they can't collide)
+single_flight = SingleFlight()
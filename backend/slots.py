@@ -0,0 +1,157 @@
+import os
+from datetime import datetime, timedelta, date
+from typing import Optional
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from stock import RELEASED_STATUSES
+
+load_dotenv()
+
+# Pickup slots: {_id: "<YYYY-MM-DD> <HH:MM>", date, time, capacity, booked}
+PICKUP_SLOTS = "pickup_slots"
+
+# Opening hours and slot length for pickups at the orchard (the order form
+# offers 08:00-18:00 every half hour, every day)
+PICKUP_OPEN = os.getenv("PICKUP_OPEN", "08:00")
+PICKUP_CLOSE = os.getenv("PICKUP_CLOSE", "18:30")
+PICKUP_SLOT_MINUTES = int(os.getenv("PICKUP_SLOT_MINUTES", "30"))
+# Days with pickups (0 = Monday)
+PICKUP_WEEKDAYS = {int(d) for d in os.getenv("PICKUP_WEEKDAYS", "0,1,2,3,4,5,6").split(",") if d.strip()}
+
+# Default capacity of one slot, counted in orders or in kg
+PICKUP_SLOT_UNIT = os.getenv("PICKUP_SLOT_UNIT", "orders")
+PICKUP_SLOT_CAPACITY = int(os.getenv("PICKUP_SLOT_CAPACITY", "6"))
+
+# Longest range one availability request may cover
+PICKUP_MAX_RANGE_DAYS = 31
+
+def slot_times() -> list[str]:
+    """Start times (HH:MM) of the slots of one pickup day"""
+    start = datetime.strptime(PICKUP_OPEN, "%H:%M")
+    close = datetime.strptime(PICKUP_CLOSE, "%H:%M")
+    times = []
+    while start + timedelta(minutes=PICKUP_SLOT_MINUTES) <= close:
+        times.append(start.strftime("%H:%M"))
+        start += timedelta(minutes=PICKUP_SLOT_MINUTES)
+    return times
+
+def slot_key(slot_date: str, slot_time: str) -> str:
+    """_id of a slot, e.g. '2026-10-20 14:00'"""
+    return f"{slot_date} {slot_time}"
+
+def slot_for(pickup_dt: datetime) -> Optional[tuple[str, str]]:
+    """(date, start time) of the slot a pickup time falls into, or None outside pickup hours"""
+    if pickup_dt.weekday() not in PICKUP_WEEKDAYS:
+        return None
+    minutes = pickup_dt.hour * 60 + pickup_dt.minute
+    for slot_time in slot_times():
+        start = datetime.strptime(slot_time, "%H:%M")
+        start_minutes = start.hour * 60 + start.minute
+        if start_minutes <= minutes < start_minutes + PICKUP_SLOT_MINUTES:
+            return pickup_dt.strftime("%Y-%m-%d"), slot_time
+    return None
+
+def slot_demand(order: dict) -> int:
+    """How much of a slot's capacity an order takes"""
+    return order.get("total_quantity_kg", 0) if PICKUP_SLOT_UNIT == "kg" else 1
+
+async def reserve_slot(db, key: str, amount: int) -> bool:
+    """
+    Book amount into a slot with one conditional $inc (booked + amount <= capacity).
+
+    Slots are created on first booking with the default capacity; a
+    duplicate key on that upsert means the existing slot is full.
+    """
+    slot_date, slot_time = key.split(" ")
+    try:
+        result = await db[PICKUP_SLOTS].update_one(
+            {"_id": key, "$expr": {"$lte": [{"$add": ["$booked", amount]}, "$capacity"]}},
+            {
+                "$inc": {"booked": amount},
+                "$setOnInsert": {"date": slot_date, "time": slot_time, "capacity": PICKUP_SLOT_CAPACITY}
+            },
+            # A new slot can't take more than the default capacity
+            upsert=amount <= PICKUP_SLOT_CAPACITY
+        )
+    except DuplicateKeyError:
+        return False
+    return result.modified_count == 1 or result.upserted_id is not None
+
+async def release_slot(db, key: str, amount: int):
+    """Give a booking back (cancellation, or rollback of a failed order)"""
+    await db[PICKUP_SLOTS].update_one({"_id": key}, {"$inc": {"booked": -amount}})
+
+async def slot_availability(db, date_from: date, date_to: date) -> list[dict]:
+    """
+    Every pickup slot between two dates (inclusive) with its free capacity.
+
+    Booked slots come from one range query on the (date, time) index;
+    slots nobody booked yet are filled in with the default capacity.
+    """
+    booked = {
+        slot["_id"]: slot
+        async for slot in db[PICKUP_SLOTS].find({"date": {"$gte": date_from.isoformat(), "$lte": date_to.isoformat()}})
+    }
+    slots = []
+    day = date_from
+    while day <= date_to:
+        if day.weekday() in PICKUP_WEEKDAYS:
+            for slot_time in slot_times():
+                slot = booked.get(slot_key(day.isoformat(), slot_time), {})
+                capacity = slot.get("capacity", PICKUP_SLOT_CAPACITY)
+                used = slot.get("booked", 0)
+                slots.append({
+                    "date": day.isoformat(),
+                    "time": slot_time,
+                    "capacity": capacity,
+                    "booked": used,
+                    "available": max(capacity - used, 0)
+                })
+        day += timedelta(days=1)
+    return slots
+
+def rebuild_slot_bookings(db):
+    """
+    Recompute 'booked' of today's and future slots from the orders that
+    hold them (sync, run at startup before requests are served).
+
+    Orders placed before slots existed get their 'pickup_slot' filled in
+    from pickup_date/pickup_time, so cancelling them releases the slot.
+    """
+    today = date.today().isoformat()
+    booked: dict[str, int] = {}
+    for order in db["orders"].find(
+        {"pickup_date": {"$gte": today}, "status": {"$nin": list(RELEASED_STATUSES)}},
+        {"pickup_date": 1, "pickup_time": 1, "pickup_slot": 1, "total_quantity_kg": 1}
+    ):
+        key = order.get("pickup_slot")
+        if not key and order.get("pickup_time"):
+            try:
+                slot = slot_for(datetime.strptime(f"{order['pickup_date']} {order['pickup_time']}", "%Y-%m-%d %H:%M"))
+            except ValueError:
+                slot = None
+            if slot is None:
+                continue
+            key = slot_key(*slot)
+            db["orders"].update_one({"_id": order["_id"]}, {"$set": {"pickup_slot": key}})
+        if key:
+            booked[key] = booked.get(key, 0) + slot_demand(order)
+
+    ops = [
+        UpdateOne(
+            {"_id": key},
+            {
+                "$set": {"booked": amount},
+                "$setOnInsert": {"date": key.split(" ")[0], "time": key.split(" ")[1], "capacity": PICKUP_SLOT_CAPACITY}
+            },
+            upsert=True
+        )
+        for key, amount in booked.items()
+    ]
+    if ops:
+        db[PICKUP_SLOTS].bulk_write(ops, ordered=False)
+    db[PICKUP_SLOTS].update_many(
+        {"date": {"$gte": today}, "_id": {"$nin": list(booked)}, "booked": {"$ne": 0}},
+        {"$set": {"booked": 0}}
+    )
@@ -0,0 +1,286 @@
+import os
+import re
+import gzip
+import mimetypes
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional
+import anyio
+from fastapi import Request
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from http_cache import make_etag, etag_matches, not_modified_response
+from content_coding import accepted_encodings, brotli_module, is_compressible
+
+# Uploads named by their SHA-256 (and variants derived from them) never change
+CONTENT_HASH_NAME = re.compile(r"^([0-9a-f]{64})(-\d+w)?\.[a-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# How /uploads bytes are delivered:
+#   python           - served by this app (Range/ETag handled here)
+#   x-accel-redirect - nginx serves UPLOADS_ACCEL_PREFIX/<file> from an internal location
+#   x-sendfile       - Apache/lighttpd style X-Sendfile with the absolute path
+UPLOADS_SERVE_MODE = os.getenv("UPLOADS_SERVE_MODE", "python").lower()
+UPLOADS_ACCEL_PREFIX = os.getenv("UPLOADS_ACCEL_PREFIX", "/protected-uploads/")
+# Cache lifetime for legacy (non content-addressed) upload names
+UPLOADS_MAX_AGE = int(os.getenv("UPLOADS_MAX_AGE", "86400"))
+
+RANGE_CHUNK_SIZE = 64 * 1024
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single 'bytes=' range into inclusive (start, end).
+    
+    Returns None when the header is absent, malformed or asks for several
+    ranges (the full file is served then). Raises ValueError when the range
+    can't be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    start_text, dash, end_text = spec.partition("-")
+    well_formed = (
+        dash
+        and (start_text.isdigit() or not start_text)
+        and (end_text.isdigit() or not end_text)
+        and (start_text or end_text)
+    )
+    if not well_formed:
+        return None
+    
+    if not start_text:
+        suffix = int(end_text)
+        if suffix == 0:
+            raise ValueError("empty suffix range")
+        return max(size - suffix, 0), size - 1
+    
+    start = int(start_text)
+    if end_text and int(end_text) < start:
+        return None
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    end = int(end_text) if end_text else size - 1
+    return start, min(end, size - 1)
+
+class FileRangeResponse(Response):
+    """206 response streaming one byte range of a file"""
+    
+    def __init__(self, path: str, start: int, end: int, size: int, headers: dict, media_type: str, method: str = "GET"):
+        super().__init__(status_code=206, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.send_header_only = method.upper() == "HEAD"
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+    
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            remaining = self.end - self.start + 1
+            while remaining > 0:
+                chunk = await file.read(min(RANGE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+class UploadsStaticFiles(StaticFiles):
+    """
+    StaticFiles for /uploads with HTTP caching.
+    
+    Content-addressed files are cached for a year as immutable, everything
+    gets a strong ETag and byte-range support. In x-accel-redirect /
+    x-sendfile mode only headers are produced and the front proxy sends
+    the bytes.
+    """
+    
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        method = scope["method"]
+        name = os.path.basename(full_path)
+        # In-progress uploads (.upload-*.part) are never served
+        if name.startswith("."):
+            return Response(status_code=404)
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        
+        content_hash = CONTENT_HASH_NAME.match(name)
+        if content_hash:
+            etag = f'"{content_hash.group(1)[:32]}{content_hash.group(2) or ""}"'
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+            cache_control = f"public, max-age={UPLOADS_MAX_AGE}"
+        
+        headers = {
+            "ETag": etag,
+            "Cache-Control": cache_control,
+            "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes"
+        }
+        
+        if UPLOADS_SERVE_MODE == "x-accel-redirect":
+            rel_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+            headers["X-Accel-Redirect"] = UPLOADS_ACCEL_PREFIX.rstrip("/") + "/" + rel_path
+            return Response(status_code=status_code, headers=headers, media_type=media_type)
+        
+        if UPLOADS_SERVE_MODE == "x-sendfile":
+            headers["X-Sendfile"] = os.path.abspath(full_path)
+            return Response(status_code=status_code, headers=headers, media_type=media_type)
+        
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            return not_modified_response(headers)
+        
+        size = stat_result.st_size
+        if_range = request_headers.get("if-range")
+        if if_range is None or if_range.strip() == etag:
+            try:
+                byte_range = parse_range(request_headers.get("range"), size)
+            except ValueError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+            if byte_range is not None:
+                start, end = byte_range
+                return FileRangeResponse(full_path, start, end, size, headers, media_type, method)
+        
+        return FileResponse(
+            full_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            headers=headers,
+            media_type=media_type,
+            method=method
+        )
+
+# Vite emits content-hashed bundles as assets/<name>-<hash>.<ext>
+VITE_HASHED_ASSET = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8,}\.[a-z0-9]+$")
+MIN_COMPRESS_SIZE = 1024
+
+class SpaAssets:
+    """
+    Index of the built frontend (frontend/dist), created once at startup.
+    
+    Every file gets its ETag, stat result and gzip/brotli siblings resolved
+    up front (existing .gz/.br files are used, missing ones are generated
+    when dist is writable). index.html is kept in memory. Serving is then a
+    dict lookup plus a sendfile.
+    """
+    
+    def __init__(self, dist_dir: Path):
+        self.dist_dir = dist_dir
+        self.built = False
+        self.files: dict[str, dict] = {}
+        self.index: Optional[dict] = None
+    
+    def build(self):
+        """Scan dist and (re)build the index"""
+        self.files = {}
+        self.index = None
+        self.built = self.dist_dir.is_dir()
+        if not self.built:
+            return
+        
+        for path in sorted(self.dist_dir.rglob("*")):
+            if not path.is_file() or path.suffix in (".gz", ".br"):
+                continue
+            rel_path = path.relative_to(self.dist_dir).as_posix()
+            self.files[rel_path] = self._index_file(path, rel_path)
+        
+        index_entry = self.files.get("index.html")
+        if index_entry is not None:
+            index_entry["bodies"] = {
+                coding: Path(variant["path"]).read_bytes()
+                for coding, variant in index_entry["encodings"].items()
+            }
+            index_entry["body"] = Path(index_entry["path"]).read_bytes()
+            self.index = index_entry
+        
+        print(f"✓ Indexed {len(self.files)} frontend files")
+    
+    def _index_file(self, path: Path, rel_path: str) -> dict:
+        data = path.read_bytes()
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if rel_path == "index.html":
+            cache_control = "no-cache"
+        elif VITE_HASHED_ASSET.match(rel_path):
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            cache_control = "public, max-age=3600"
+        
+        encodings = {}
+        if is_compressible(media_type) and len(data) >= MIN_COMPRESS_SIZE:
+            for coding, suffix, compress in (("br", ".br", self._brotli), ("gzip", ".gz", self._gzip)):
+                sibling = self._compressed_sibling(path, suffix, data, compress)
+                if sibling is not None:
+                    encodings[coding] = {"path": str(sibling), "stat": os.stat(sibling)}
+        
+        return {
+            "path": str(path),
+            "stat": os.stat(path),
+            "media_type": media_type,
+            "etag": make_etag(data),
+            "cache_control": cache_control,
+            "encodings": encodings
+        }
+    
+    @staticmethod
+    def _gzip(data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    
+    @staticmethod
+    def _brotli(data: bytes) -> Optional[bytes]:
+        brotli = brotli_module()
+        return brotli.compress(data, quality=11) if brotli else None
+    
+    @staticmethod
+    def _compressed_sibling(path: Path, suffix: str, data: bytes, compress) -> Optional[Path]:
+        sibling = path.with_name(path.name + suffix)
+        if sibling.is_file() and sibling.stat().st_mtime >= path.stat().st_mtime:
+            return sibling
+        compressed = compress(data)
+        if compressed is None or len(compressed) >= len(data):
+            return None
+        try:
+            sibling.write_bytes(compressed)
+        except OSError:
+            return None
+        return sibling
+    
+    def response(self, request: Request, rel_path: str) -> Optional[Response]:
+        """Response for a dist file (index.html for unknown paths), None if not built"""
+        entry = self.files.get(rel_path) or self.index
+        if entry is None:
+            return None
+        
+        accepted = accepted_encodings(request.headers.get("accept-encoding"))
+        coding = next((c for c in ("br", "gzip") if c in entry["encodings"] and c in accepted), None)
+        # Each encoding is its own representation, so it gets its own ETag
+        etag = entry["etag"] if coding is None else f'{entry["etag"][:-1]}-{coding}"'
+        headers = {"ETag": etag, "Cache-Control": entry["cache_control"]}
+        if entry["encodings"]:
+            headers["Vary"] = "Accept-Encoding"
+        
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified_response(headers)
+        
+        if coding is not None:
+            headers["Content-Encoding"] = coding
+        
+        if entry is self.index:
+            body = entry["body"] if coding is None else entry["bodies"][coding]
+            return Response(content=body, media_type=entry["media_type"], headers=headers)
+        
+        variant = entry if coding is None else entry["encodings"][coding]
+        return FileResponse(
+            variant["path"],
+            media_type=entry["media_type"],
+            stat_result=variant["stat"],
+            headers=headers,
+            method=request.method
+        )
@@ -0,0 +1,96 @@
+from datetime import datetime
+from pymongo import UpdateOne
+
+# Sales rollups, one document per (day, variety, status):
+# {_id: "<day>|<apple_id>|<status>", day, apple_id, apple_name, status,
+#  quantity_kg, revenue, line_items}
+ORDER_STATS = "order_stats"
+
+def stats_day(created_at: datetime) -> str:
+    """Rollup day of an order (UTC creation date)"""
+    return created_at.strftime("%Y-%m-%d")
+
+def stats_ops(order: dict, order_status: str, sign: int) -> list[UpdateOne]:
+    """$inc writes adding (sign=1) or removing (sign=-1) an order's items from one status"""
+    day = stats_day(order["created_at"])
+    ops = []
+    for item in order.get("apples") or []:
+        ops.append(UpdateOne(
+            {"_id": f"{day}|{item['apple_id']}|{order_status}"},
+            {
+                "$inc": {
+                    "quantity_kg": sign * item["quantity_kg"],
+                    "revenue": sign * item["subtotal"],
+                    "line_items": sign
+                },
+                "$set": {"apple_name": item["apple_name"]},
+                "$setOnInsert": {"day": day, "apple_id": item["apple_id"], "status": order_status}
+            },
+            upsert=True
+        ))
+    return ops
+
+async def record_new_order_stats(db, order: dict):
+    """Add a freshly inserted order to the rollups of its status"""
+    ops = stats_ops(order, order["status"], 1)
+    if ops:
+        await db[ORDER_STATS].bulk_write(ops, ordered=False)
+
+async def record_order_stats(db, orders: list[dict], new_status: str):
+    """Move orders (as read before the change) from their status to new_status in one bulk write"""
+    ops = []
+    for order in orders:
+        if order.get("status") == new_status:
+            continue
+        if order.get("status"):
+            ops.extend(stats_ops(order, order["status"], -1))
+        ops.extend(stats_ops(order, new_status, 1))
+    if ops:
+        await db[ORDER_STATS].bulk_write(ops, ordered=False)
+
+def rebuild_order_stats(db):
+    """Recompute 'order_stats' from 'orders' with one aggregation (sync)"""
+    db["orders"].aggregate([
+        {"$unwind": "$apples"},
+        {
+            "$group": {
+                "_id": {
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                    "apple_id": "$apples.apple_id",
+                    "status": "$status"
+                },
+                "apple_name": {"$last": "$apples.apple_name"},
+                "quantity_kg": {"$sum": "$apples.quantity_kg"},
+                "revenue": {"$sum": "$apples.subtotal"},
+                "line_items": {"$sum": 1}
+            }
+        },
+        {
+            "$project": {
+                "_id": {"$concat": ["$_id.day", "|", "$_id.apple_id", "|", "$_id.status"]},
+                "day": "$_id.day",
+                "apple_id": "$_id.apple_id",
+                "status": "$_id.status",
+                "apple_name": 1,
+                "quantity_kg": 1,
+                "revenue": 1,
+                "line_items": 1
+            }
+        },
+        # $out swaps the collection in atomically (indexes are kept)
+        {"$out": ORDER_STATS}
+    ])
+
+if __name__ == "__main__":
+    import sys
+    from database import get_db
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python stats.py rebuild")
+        sys.exit(1)
+
+    database = get_db()
+    if database is None:
+        sys.exit(1)
+    rebuild_order_stats(database)
+    print(f"✓ Rebuilt '{ORDER_STATS}' ({database[ORDER_STATS].count_documents({})} rollups)")
@@ -0,0 +1,64 @@
+from typing import Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+
+# Order statuses that don't hold stock
+RELEASED_STATUSES = ("cancelled",)
+
+# Set on orders whose kg were taken out of stock_kg. Orders placed before
+# stock was tracked don't have it, so cancelling them gives nothing back.
+STOCK_RESERVED = "stock_reserved"
+
+def holds_stock(order_status: Optional[str]) -> bool:
+    """Whether an order in this status keeps its kg taken out of stock"""
+    return order_status not in RELEASED_STATUSES
+
+def stock_lines(items: list[dict]) -> dict[str, int]:
+    """kg per apple_id for an order's line items (repeated varieties summed)"""
+    lines: dict[str, int] = {}
+    for item in items:
+        lines[item["apple_id"]] = lines.get(item["apple_id"], 0) + item["quantity_kg"]
+    return lines
+
+async def reserve_stock(db, items: list[dict]) -> Optional[str]:
+    """
+    Take kg for every line of an order out of apples' 'stock_kg'.
+
+    Each line is one conditional $inc that only matches while
+    stock_kg >= quantity, so concurrent orders can't oversell. If any line
+    fails, lines already taken are given back. Returns the apple_id that
+    ran out, or None when everything was reserved.
+    """
+    reserved: dict[str, int] = {}
+    for apple_id, quantity in stock_lines(items).items():
+        result = await db["apples"].update_one(
+            {"_id": ObjectId(apple_id), "stock_kg": {"$gte": quantity}},
+            {"$inc": {"stock_kg": -quantity}}
+        )
+        if result.modified_count == 0:
+            await release_stock(db, [{"apple_id": a, "quantity_kg": q} for a, q in reserved.items()])
+            return apple_id
+        reserved[apple_id] = quantity
+    return None
+
+async def release_stock(db, items: list[dict]):
+    """Give an order's kg back to stock (cancellation, or rollback of a failed order)"""
+    ops = [
+        UpdateOne({"_id": ObjectId(apple_id)}, {"$inc": {"stock_kg": quantity}})
+        for apple_id, quantity in stock_lines(items).items()
+    ]
+    if ops:
+        await db["apples"].bulk_write(ops, ordered=False)
+
+def init_stock(db):
+    """
+    Start stock tracking for apples that don't have 'stock_kg' yet, at
+    their max_quantity_kg (sync, run at startup). Apples already tracked are
+    left alone - from then on admins set stock and orders take it.
+    Existing orders never took from this stock (see STOCK_RESERVED).
+    """
+    result = db["apples"].update_many(
+        {"stock_kg": {"$exists": False}},
+        [{"$set": {"stock_kg": {"$ifNull": ["$max_quantity_kg", 0]}}}]
+    )
+    return result.modified_count
@@ -9,6 +9,8 @@ interface Apple {
   price: number
   photo_url?: string
   available: boolean
+  max_quantity_kg?: number
+  stock_kg?: number
 }
 
 interface AdminContentProps {
@@ -26,7 +28,8 @@ export default function AdminContent({ onClose }: AdminContentProps) {
     description: '',
     price: 0,
     available: true,
-    max_quantity_kg: 250
+    max_quantity_kg: 250,
+    stock_kg: 250
   })
   const [photoFile, setPhotoFile] = useState<File | null>(null)
   const [message, setMessage] = useState('')
@@ -83,7 +86,11 @@ export default function AdminContent({ onClose }: AdminContentProps) {
         price: formData.price,
         available: formData.available,
         photo_url: photoUrl,
-        max_quantity_kg: (formData as any).max_quantity_kg || 250
+        max_quantity_kg: (formData as any).max_quantity_kg || 250,
+        // Only send stock when it was changed, so orders taken meanwhile aren't overwritten
+        ...(!editingApple || Number(formData.stock_kg) !== editingApple.stock_kg
+          ? { stock_kg: Number(formData.stock_kg) || 0 }
+          : {})
       }
 
       if (editingApple) {
@@ -94,7 +101,7 @@ export default function AdminContent({ onClose }: AdminContentProps) {
         setMessage('✓ Odmiana dodana')
       }
 
-      setFormData({ name: '', description: '', price: 0, available: true, max_quantity_kg: 250 })
+      setFormData({ name: '', description: '', price: 0, available: true, max_quantity_kg: 250, stock_kg: 250 })
       setPhotoFile(null)
       setEditingApple(null)
       setNewApple(false)
@@ -132,14 +139,15 @@ export default function AdminContent({ onClose }: AdminContentProps) {
       description: apple.description,
       price: apple.price,
       available: apple.available,
-      max_quantity_kg: (apple as any).max_quantity_kg || 250
+      max_quantity_kg: (apple as any).max_quantity_kg || 250,
+      stock_kg: apple.stock_kg ?? 0
     })
   }
 
   const cancelEdit = () => {
     setEditingApple(null)
     setNewApple(false)
-    setFormData({ name: '', description: '', price: 0, available: true, max_quantity_kg: 250 })
+    setFormData({ name: '', description: '', price: 0, available: true, max_quantity_kg: 250, stock_kg: 250 })
     setPhotoFile(null)
   }
 
@@ -205,6 +213,7 @@ export default function AdminContent({ onClose }: AdminContentProps) {
                         <p className="status">
                           {apple.available ? '✓ Dostępna' : '✗ Niedostępna'}
                         </p>
+                        <p className="status">Na stanie: {apple.stock_kg ?? 0} kg</p>
                         <div className="apple-actions">
                           <button 
                             className="edit-btn"
@@ -276,6 +285,19 @@ export default function AdminContent({ onClose }: AdminContentProps) {
                   <small>Maksimum dla klienta będzie min(250kg, ta ilość)</small>
                 </div>
 
+                <div className="form-group">
+                  <label>Na stanie (kg) *</label>
+                  <input
+                    type="number"
+                    name="stock_kg"
+                    value={formData.stock_kg}
+                    onChange={handleInputChange}
+                    min="0"
+                    step="5"
+                  />
+                  <small>Zamówienia zmniejszają stan, anulowanie go przywraca</small>
+                </div>
+
                 <div className="form-group">
                   <label>Dostępność</label>
                   <select
@@ -11,6 +11,7 @@ interface Apple {
   photo_url?: string
   available: boolean
   max_quantity_kg?: number
+  stock_kg?: number
 }
 
 interface AppleSelection {
@@ -399,7 +400,7 @@ export default function Order() {
                   {selectedApples.map(selection => {
                     const apple = apples.find(a => a._id === selection.apple_id)
                     if (!apple) return null
-                    const maxQuantity = Math.min(250, apple.max_quantity_kg || 250)
+                    const maxQuantity = Math.min(250, apple.max_quantity_kg || 250, apple.stock_kg ?? 250)
                     return (
                       <div key={selection.apple_id} className="selected-item">
                         <div className="item-info">